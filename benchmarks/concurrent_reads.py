@@ -0,0 +1,149 @@
+"""Benchmark of concurrent browse, search and lookup requests to the library.
+
+Fills a new library database with the synthetic tracks of the insert_tracks
+benchmark, then has simulated clients, each in a thread of its own, call
+:class:`mopidy_local.library.LocalLibraryProvider` at the same time, the way
+HTTP and MPD clients do. Run it with e.g.::
+
+    python benchmarks/concurrent_reads.py --tracks 20000 --clients 16
+
+Besides requests for random albums, artists and tracks, each client lists all
+albums and artists, as MPD clients tend to do. Requests that fail, or return
+other results than expected, are counted as errors. Use ``--cache-size 0`` to
+disable the library's result cache.
+"""
+
+import argparse
+import random
+import tempfile
+import threading
+import time
+
+from insert_tracks import ALBUMS_PER_ARTIST, TRACKS_PER_ALBUM, make_tracks
+
+from mopidy_local import library, storage
+
+
+def load(config, tracks):
+    provider = storage.LocalStorageProvider(config)
+    provider.load()
+    provider.begin()
+    for track in tracks:
+        provider.add(track, {})
+    provider.close()
+
+
+def requests(provider, tracks, rng):
+    track = rng.choice(tracks)
+    album, artist = track.album, next(iter(track.artists))
+    # the URIs assigned by the storage provider
+    album_uri = storage.model_uri("album", album)
+    artist_uri = storage.model_uri("artist", artist)
+    yield (
+        lambda: provider.browse("local:directory?type=album"),
+        lambda refs: len(refs) == len(tracks) // TRACKS_PER_ALBUM,
+    )
+    yield (
+        lambda: provider.get_distinct("artist"),
+        lambda values: (
+            len(values) == len(tracks) // TRACKS_PER_ALBUM // ALBUMS_PER_ARTIST
+        ),
+    )
+    yield (
+        lambda: provider.browse(album_uri),
+        lambda refs: len(refs) == TRACKS_PER_ALBUM,
+    )
+    yield (
+        lambda: provider.lookup(track.uri),
+        lambda result: [t.uri for t in result] == [track.uri],
+    )
+    yield (
+        lambda: provider.lookup(artist_uri),
+        lambda result: len(result) == TRACKS_PER_ALBUM * ALBUMS_PER_ARTIST,
+    )
+    yield (
+        lambda: provider.search({"album": [album.name]}).tracks,
+        lambda result: (
+            result and all(t.album.name.startswith(album.name) for t in result)
+        ),
+    )
+    yield (
+        lambda: provider.search({"any": [album.name]}, exact=True).tracks,
+        lambda result: len(result) == TRACKS_PER_ALBUM,
+    )
+
+
+def client(provider, tracks, requests_per_client, seed, errors):
+    rng = random.Random(seed)  # noqa: S311
+    done = 0
+    while done < requests_per_client:
+        for request, check in requests(provider, tracks, rng):
+            try:
+                if not check(request()):
+                    errors.append("unexpected result")
+            except Exception as e:
+                errors.append(repr(e))
+            done += 1
+
+
+def run(config, tracks, clients, requests_per_client):
+    provider = library.LocalLibraryProvider(backend=None, config=config)
+    errors = []
+    threads = [
+        threading.Thread(
+            target=client,
+            args=(provider, tracks, requests_per_client, seed, errors),
+        )
+        for seed in range(clients)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duration = time.perf_counter() - start
+    info = provider.cache_info()
+    provider.close()
+    return duration, errors, info
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tracks", type=int, default=20_000)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--cache-size", type=int, default=10_000)
+    args = parser.parse_args()
+
+    # only full albums, so every browse returns TRACKS_PER_ALBUM tracks
+    count = args.tracks // TRACKS_PER_ALBUM // ALBUMS_PER_ARTIST
+    tracks = list(make_tracks(count * TRACKS_PER_ALBUM * ALBUMS_PER_ARTIST))
+    with tempfile.TemporaryDirectory() as data_dir:
+        config = {
+            "core": {"data_dir": data_dir},
+            "local": {
+                "media_dir": data_dir,
+                "directories": [],
+                "album_art_files": [],
+                "timeout": 10,
+                "journal_mode": "wal",
+                "sort_ignore_articles": [],
+                "cache_size": args.cache_size,
+                "max_search_results": 100,
+                "use_artist_sortname": False,
+            },
+        }
+        load(config, tracks)
+        duration, errors, info = run(config, tracks, args.clients, args.requests)
+    total = args.clients * args.requests
+    print(
+        f"{args.clients} clients made {total} requests in {duration:.3f}s, "
+        f"{total / duration:.0f} requests/s, {len(errors)} errors",
+    )
+    print(f"{info.hits} cache hits, {info.misses} misses")
+    for error in sorted(set(errors))[:5]:
+        print(f"  {error}")
+
+
+if __name__ == "__main__":
+    main()
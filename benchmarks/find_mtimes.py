@@ -0,0 +1,75 @@
+"""Benchmark of how long it takes to find the files in a large media directory.
+
+Builds a synthetic tree of empty files laid out like a music collection, i.e.
+``artist/album/track``, and times :func:`mopidy_local.mtimes.find_mtimes`
+over it with a range of thread counts. Run it with e.g.::
+
+    python benchmarks/find_mtimes.py --files 1000000 --threads 1 4 10 32
+
+The tree is created in a temporary directory, unless ``--dir`` points to an
+existing tree to search instead, e.g. one on a network file system.
+"""
+
+import argparse
+import pathlib
+import tempfile
+import time
+
+from mopidy_local import mtimes
+
+TRACKS_PER_ALBUM = 12
+ALBUMS_PER_ARTIST = 8
+
+
+def make_tree(root, files):
+    count = 0
+    artist = 0
+    while count < files:
+        for album in range(ALBUMS_PER_ARTIST):
+            album_dir = root / f"artist{artist:06d}" / f"album{album:02d}"
+            album_dir.mkdir(parents=True)
+            for track in range(min(TRACKS_PER_ALBUM, files - count)):
+                (album_dir / f"{track:02d} track.flac").touch()
+                count += 1
+            if count >= files:
+                break
+        artist += 1
+
+
+def run(root, thread_counts, rounds):
+    for thread_count in thread_counts:
+        timings = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            result, errors = mtimes.find_mtimes(root, thread_count=thread_count)
+            timings.append(time.perf_counter() - start)
+        print(
+            f"{thread_count:>3} threads: {min(timings):.3f}s best "
+            f"of {rounds} to find {len(result)} files, {len(errors)} errors",
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=1_000_000)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4, 10])
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--dir", type=pathlib.Path)
+    args = parser.parse_args()
+
+    if args.dir is not None:
+        run(args.dir, args.threads, args.rounds)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        root = pathlib.Path(tmp_dir)
+        start = time.perf_counter()
+        make_tree(root, args.files)
+        print(
+            f"Created {args.files} files in {time.perf_counter() - start:.3f}s",
+        )
+        run(root, args.threads, args.rounds)
+
+
+if __name__ == "__main__":
+    main()
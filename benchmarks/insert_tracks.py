@@ -0,0 +1,97 @@
+"""Benchmark of how fast scanned tracks are written to the library.
+
+Adds synthetic tracks, laid out like a music collection with albums of 12
+tracks by artists with 8 albums each, to a new library database through
+:class:`mopidy_local.storage.LocalStorageProvider`, the same way
+``mopidy local scan`` does. Run it with e.g.::
+
+    python benchmarks/insert_tracks.py --tracks 100000
+
+With ``--rescan``, the same tracks are then added again, as by ``mopidy local
+scan --force`` on an unchanged collection. With ``--bulk-load``, the full-text
+index is rebuilt once at the end, as ``mopidy local scan`` does when many files
+changed.
+"""
+
+import argparse
+import tempfile
+import time
+
+from mopidy.models import Album, Artist, Track
+
+from mopidy_local import storage
+
+TRACKS_PER_ALBUM = 12
+ALBUMS_PER_ARTIST = 8
+
+
+def make_tracks(count):
+    for i in range(count):
+        album_no, track_no = divmod(i, TRACKS_PER_ALBUM)
+        artist_no = album_no // ALBUMS_PER_ARTIST
+        artist = Artist(name=f"Artist {artist_no}")
+        album = Album(
+            name=f"Album {album_no}",
+            artists=[artist],
+            num_tracks=TRACKS_PER_ALBUM,
+            date="2001",
+        )
+        yield Track(
+            uri=f"local:track:artist{artist_no}/album{album_no}/{track_no}.flac",
+            name=f"Track {track_no + 1}",
+            album=album,
+            artists=[artist],
+            track_no=track_no + 1,
+            genre="Rock",
+            length=180_000,
+            last_modified=1_000_000 + i,
+        )
+
+
+def run(data_dir, tracks, flush_threshold, *, bulk_load=False):
+    config = {
+        "core": {"data_dir": data_dir},
+        "local": {
+            "media_dir": data_dir,
+            "album_art_files": [],
+            "timeout": 10,
+            "journal_mode": "wal",
+            "sort_ignore_articles": [],
+            "scan_flush_threshold": flush_threshold,
+        },
+    }
+    library = storage.LocalStorageProvider(config)
+    library.load()
+    start = time.perf_counter()
+    if bulk_load:
+        library.begin_bulk_load()
+    for count, track in enumerate(tracks, start=1):
+        library.add(track, {})
+        if flush_threshold and count % flush_threshold == 0:
+            library.flush()
+    library.close()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tracks", type=int, default=100_000)
+    parser.add_argument("--flush-threshold", type=int, default=100)
+    parser.add_argument("--rescan", action="store_true")
+    parser.add_argument("--bulk-load", action="store_true")
+    args = parser.parse_args()
+
+    tracks = list(make_tracks(args.tracks))
+    with tempfile.TemporaryDirectory() as data_dir:
+        for what in ("Added", "Rescanned") if args.rescan else ("Added",):
+            duration = run(
+                data_dir, tracks, args.flush_threshold, bulk_load=args.bulk_load
+            )
+            print(
+                f"{what} {args.tracks} tracks in {duration:.3f}s, "
+                f"{args.tracks / duration:.0f} tracks/s",
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -33,11 +33,20 @@ class Extension(ext.Extension):
         schema["scan_timeout"] = config.Integer(minimum=1000, maximum=1000 * 60 * 60)
         schema["scan_flush_threshold"] = config.Integer(minimum=0)
         schema["scan_follow_symlinks"] = config.Boolean()
+        schema["scan_workers"] = config.Integer(minimum=1)
+        schema["scan_walk_threads"] = config.Integer(minimum=1)
         schema["included_file_extensions"] = config.List(optional=True)
         schema["excluded_file_extensions"] = config.List(optional=True)
+        schema["scan_include_patterns"] = config.List(optional=True)
+        schema["scan_exclude_patterns"] = config.List(optional=True)
         schema["directories"] = config.List()
         schema["timeout"] = config.Integer(optional=True, minimum=1)
+        schema["journal_mode"] = config.String(
+            choices=["delete", "truncate", "persist", "wal"],
+        )
+        schema["cache_size"] = config.Integer(minimum=0)
         schema["use_artist_sortname"] = config.Boolean()
+        schema["sort_ignore_articles"] = config.List(optional=True)
         schema["album_art_files"] = config.List(optional=True)
         return schema
 
@@ -24,3 +24,6 @@ class LocalBackend(pykka.ThreadingActor, backend.Backend):
 
         self.playback = LocalPlaybackProvider(audio=audio, backend=self)
         self.library = LocalLibraryProvider(backend=self, config=config)
+
+    def on_stop(self):
+        self.library.close()
@@ -0,0 +1,75 @@
+import collections
+import threading
+from typing import NamedTuple
+
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    size: int
+    maxsize: int
+
+
+class ResultCache:
+    """Thread-safe LRU cache of query results.
+
+    `version` is called on every lookup, and the cache is cleared whenever
+    it returns another value than before, e.g. a database's `data_version`.
+
+    The size of a cached result is its length, so `maxsize` bounds the
+    number of cached refs, tracks or values rather than the number of
+    results. Results larger than `maxsize` are not cached at all.
+    """
+
+    def __init__(self, maxsize, version):
+        self._maxsize = maxsize
+        self._version = version
+        self._entries = collections.OrderedDict()
+        self._current = None
+        self._size = 0
+        self._hits = 0
+        self._misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, func, *args):
+        with self._lock:
+            version = self._version()
+            if version != self._current:
+                self._clear(version)
+            try:
+                value = self._entries[key]
+            except KeyError:
+                self._misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return value
+        value = func(*args)
+        with self._lock:
+            # skip results that may predate a change seen by another thread
+            if version == self._current and key not in self._entries:
+                self._put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._clear(self._current)
+
+    def info(self):
+        with self._lock:
+            return CacheInfo(self._hits, self._misses, self._size, self._maxsize)
+
+    def _clear(self, version):
+        self._entries.clear()
+        self._current = version
+        self._size = 0
+
+    def _put(self, key, value):
+        size = max(len(value), 1)
+        if size > self._maxsize:
+            return
+        self._entries[key] = value
+        self._size += size
+        while self._size > self._maxsize:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= max(len(evicted), 1)
@@ -1,4 +1,9 @@
+import contextlib
+import itertools
+import json
 import logging
+import multiprocessing
+import multiprocessing.connection
 import pathlib
 import time
 from typing import Annotated
@@ -7,19 +12,27 @@ import cyclopts
 from mopidy.audio.scan import Scanner
 from mopidy.audio.tags import convert_tags_to_track
 from mopidy.config import Config
-from mopidy.exceptions import ScannerError
+from mopidy.exceptions import MopidyException, ScannerError
 from mopidy.models import Track
 
-from mopidy_local import mtimes, storage, translator
+from mopidy_local import mtimes, storage, translator, watcher
 
 logger = logging.getLogger(__name__)
 
 MIN_DURATION_MS = 100  # Shortest length of track to include.
 
+# Share of media files to scan above which the full-text index is rebuilt
+# once, rather than updated for each track.
+BULK_LOAD_RATIO = 0.25
+
 
 app = cyclopts.App(help="Local extension commands.")
 
 
+class ScanWorkerError(MopidyException):
+    pass
+
+
 @app.command(help="Clear local media files from the local library.")
 def clear() -> int:
     config = Config.get_global()
@@ -57,56 +70,203 @@ def scan(
             negative="",
         ),
     ] = False,
+    retry_failed: Annotated[
+        bool,
+        cyclopts.Parameter(
+            name="--retry-failed",
+            help="Retry media files which previously failed to scan.",
+            negative="",
+        ),
+    ] = False,
+    incremental: Annotated[
+        bool,
+        cyclopts.Parameter(
+            name="--incremental",
+            help="Only look for changed files in modified directories.",
+            negative="",
+        ),
+    ] = False,
+    jobs: Annotated[
+        int | None,
+        cyclopts.Parameter(
+            name="--jobs",
+            help="Number of metadata scanner processes to run in parallel.",
+            validator=cyclopts.validators.Number(gte=1),
+        ),
+    ] = None,
 ) -> int:
     config = Config.get_global()
     media_dir = pathlib.Path(config["local"]["media_dir"]).resolve()
     library = storage.LocalStorageProvider(config)
+    num_tracks = library.load()
+    scan_filter = _scan_filter(config)
 
-    file_mtimes = _find_files(
+    file_mtimes, dir_mtimes = _find_files(
         media_dir=media_dir,
         follow_symlinks=config["local"]["scan_follow_symlinks"],
+        walk_threads=config["local"]["scan_walk_threads"],
+        file_filter=_file_filter(config, media_dir),
+        library=library,
+        known_dirs=library.scan_directories(scan_filter) if incremental else {},
     )
 
     files_to_update, files_in_library = _check_tracks_in_library(
         media_dir=media_dir,
         file_mtimes=file_mtimes,
         library=library,
+        num_tracks=num_tracks,
         force_rescan=force_rescan,
     )
 
+    failed_files = _check_scan_failures(
+        media_dir=media_dir,
+        file_mtimes=file_mtimes,
+        library=library,
+        retry_failed=retry_failed or force_rescan,
+    )
+
     files_to_update.update(
         _find_files_to_scan(
-            media_dir=media_dir,
             file_mtimes=file_mtimes,
             files_in_library=files_in_library,
-            included_file_exts=[
-                file_ext.lower()
-                for file_ext in config["local"]["included_file_extensions"]
-            ],
-            excluded_file_exts=[
-                file_ext.lower()
-                for file_ext in config["local"]["excluded_file_extensions"]
-            ],
+            failed_files=failed_files,
         ),
     )
 
-    _scan_metadata(
-        media_dir=media_dir,
-        file_mtimes=file_mtimes,
-        files=files_to_update,
-        library=library,
-        timeout=config["local"]["scan_timeout"],
-        flush_threshold=config["local"]["scan_flush_threshold"],
-        tracks_limit=tracks_limit,
+    # Files rescanned with --force are mostly unchanged, and don't touch the
+    # full-text index then.
+    num_changes = len(
+        files_to_update - files_in_library if force_rescan else files_to_update
     )
+    if tracks_limit is not None:
+        num_changes = min(num_changes, tracks_limit)
+    if num_changes and num_changes >= BULK_LOAD_RATIO * len(file_mtimes):
+        logger.info(
+            f"Scanning {num_changes} new or modified files; "
+            "rebuilding full-text index when done"
+        )
+        library.begin_bulk_load()
+
+    try:
+        _scan_metadata(
+            media_dir=media_dir,
+            file_mtimes=file_mtimes,
+            files=files_to_update,
+            library=library,
+            timeout=config["local"]["scan_timeout"],
+            flush_threshold=config["local"]["scan_flush_threshold"],
+            tracks_limit=tracks_limit,
+            workers=jobs if jobs is not None else config["local"]["scan_workers"],
+        )
+    except ScanWorkerError as error:
+        # Keep the tracks scanned so far, but not the directory mtimes, so
+        # the remaining files are found again by the next scan
+        logger.error(f"Scanning aborted: {error}")
+        library.close()
+        return 1
+
+    # With a limit, unchanged directories may still hold unscanned files
+    if tracks_limit is None:
+        library.set_scan_directories(
+            {
+                translator.path_to_local_directory_uri(path, media_dir): mtime
+                for path, mtime in dir_mtimes.items()
+            },
+            scan_filter,
+        )
 
     library.close()
     return 0
 
 
-def _find_files(*, media_dir, follow_symlinks):
+@app.command(help="Watch local media files and keep the local library updated.")
+def watch(
+    *,
+    delay: Annotated[
+        float,
+        cyclopts.Parameter(
+            name="--delay",
+            help="Seconds to wait for further changes before updating.",
+        ),
+    ] = 2.0,
+    jobs: Annotated[
+        int | None,
+        cyclopts.Parameter(
+            name="--jobs",
+            help="Number of metadata scanner processes to run in parallel.",
+            validator=cyclopts.validators.Number(gte=1),
+        ),
+    ] = None,
+) -> int:
+    config = Config.get_global()
+    media_dir = pathlib.Path(config["local"]["media_dir"]).resolve()
+    library = storage.LocalStorageProvider(config)
+    library.load()
+    workers = jobs if jobs is not None else config["local"]["scan_workers"]
+
+    try:
+        with watcher.Watcher(
+            media_dir,
+            follow=config["local"]["scan_follow_symlinks"],
+        ) as media_watcher:
+            logger.info(f"Watching {media_dir.as_uri()} for changes ...")
+            while True:
+                changes = media_watcher.changes(delay)
+                if changes.overflowed:
+                    logger.info("Falling back to a full scan")
+                    if scan(jobs=jobs):
+                        return 1
+                    continue
+                _update_paths(
+                    media_dir=media_dir,
+                    changes=changes,
+                    library=library,
+                    config=config,
+                    workers=workers,
+                )
+    except watcher.WatchError as error:
+        logger.error(f"Cannot watch {media_dir.as_uri()}: {error}")
+        return 1
+    except ScanWorkerError as error:
+        logger.error(f"Scanning aborted: {error}")
+        library.close()
+        return 1
+    except KeyboardInterrupt:
+        library.close()
+    return 0
+
+
+def _find_files(  # noqa: PLR0913
+    *,
+    media_dir,
+    follow_symlinks,
+    walk_threads,
+    file_filter,
+    library,
+    known_dirs,
+):
     logger.info(f"Finding files in {media_dir.as_uri()} ...")
-    file_mtimes, file_errors = mtimes.find_mtimes(media_dir, follow=follow_symlinks)
+    known_dirs = {
+        translator.local_uri_to_path(uri, media_dir): mtime
+        for uri, mtime in known_dirs.items()
+    }
+    file_mtimes, dir_mtimes, unchanged_dirs, file_errors = mtimes.find_changed_mtimes(
+        media_dir,
+        known_dirs,
+        follow=follow_symlinks,
+        thread_count=walk_threads,
+        file_filter=file_filter,
+    )
+    if unchanged_dirs:
+        logger.info(f"Skipped files in {len(unchanged_dirs)} unchanged directories")
+        file_mtimes.update(
+            _find_known_files(
+                media_dir=media_dir,
+                dirs=unchanged_dirs,
+                file_filter=file_filter,
+                library=library,
+            ),
+        )
     logger.info(f"Found {len(file_mtimes)} files in {media_dir.as_uri()}")
 
     if file_errors:
@@ -117,7 +277,30 @@ def _find_files(*, media_dir, follow_symlinks):
     for path in file_errors:
         logger.warning(f"Error for {path.as_uri()}: {file_errors[path]}")
 
-    return file_mtimes
+    return file_mtimes, dir_mtimes
+
+
+def _find_known_files(*, media_dir, dirs, file_filter, library):
+    """Get mtimes for files in ``dirs`` from the library instead of the disk."""
+    known_files = {}
+    local_mtimes = itertools.chain(
+        library.track_mtimes(),
+        library.scan_failures().items(),
+    )
+    for local_uri, mtime in local_mtimes:
+        absolute_path = translator.local_uri_to_path(local_uri, media_dir)
+        if absolute_path.parent not in dirs or file_filter.excludes_path(
+            absolute_path.relative_to(media_dir)
+        ):
+            continue
+        if mtime is not None:
+            known_files[absolute_path] = mtime
+            continue
+        # Tracks with invalid data have no mtime in the library, but must
+        # still be found to be rescanned instead of removed as missing
+        with contextlib.suppress(OSError):
+            known_files[absolute_path] = int(absolute_path.stat().st_mtime * 1000)
+    return known_files
 
 
 def _check_tracks_in_library(
@@ -125,85 +308,154 @@ def _check_tracks_in_library(
     media_dir,
     file_mtimes,
     library,
+    num_tracks,
     force_rescan,
 ):
-    num_tracks = library.load()
     logger.info(f"Checking {num_tracks} tracks from library")
 
     uris_to_remove = set()
     files_to_update = set()
     files_in_library = set()
 
-    for track in library.begin():
-        absolute_path = translator.local_uri_to_path(track.uri, media_dir)
+    for local_uri, last_modified in library.track_mtimes():
+        absolute_path = translator.local_uri_to_path(local_uri, media_dir)
         mtime = file_mtimes.get(absolute_path)
         if mtime is None:
-            logger.debug(f"Removing {track.uri}: File not found")
-            uris_to_remove.add(track.uri)
-        elif mtime > track.last_modified or force_rescan:
+            logger.debug(f"Removing {local_uri}: File not found")
+            uris_to_remove.add(local_uri)
+        elif last_modified is None or mtime > last_modified or force_rescan:
+            # Tracks with invalid data in the library are rescanned as well
             files_to_update.add(absolute_path)
         files_in_library.add(absolute_path)
 
     logger.info(f"Removing {len(uris_to_remove)} missing tracks")
-    for local_uri in uris_to_remove:
-        library.remove(local_uri)
+    if uris_to_remove:
+        library.remove_tracks(uris_to_remove)
 
     return files_to_update, files_in_library
 
 
-def _find_files_to_scan(
-    *,
-    media_dir,
-    file_mtimes,
-    files_in_library,
-    included_file_exts,
-    excluded_file_exts,
-):
-    files_to_update = set()
+def _check_scan_failures(*, media_dir, file_mtimes, library, retry_failed):
+    failed_files = set()
 
-    def _is_hidden_file(relative_path, file_uri):
-        if any(p.startswith(".") for p in relative_path.parts):
-            logger.debug(f"Skipped {file_uri}: Hidden directory/file")
-            return True
-        return False
-
-    def _extension_filters(
-        relative_path,
-        file_uri,
-        included_file_exts,
-        excluded_file_exts,
-    ):
-        if included_file_exts:
-            if relative_path.suffix.lower() in included_file_exts:
-                logger.debug(f"Added {file_uri}: File extension on included list")
-                return True
-            logger.debug(
-                f"Skipped {file_uri}: File extension not on included list",
-            )
-            return False
-        if relative_path.suffix.lower() in excluded_file_exts:
-            logger.debug(f"Skipped {file_uri}: File extension on excluded list")
-            return False
-        logger.debug(
-            f"Included {file_uri}: File extension not on excluded list",
+    for local_uri, last_modified in library.scan_failures().items():
+        absolute_path = translator.local_uri_to_path(local_uri, media_dir)
+        mtime = file_mtimes.get(absolute_path)
+        if mtime is None:
+            logger.debug(f"Forgetting scan failure for {local_uri}: File not found")
+            library.remove_scan_failure(local_uri)
+        elif mtime == last_modified and not retry_failed:
+            failed_files.add(absolute_path)
+
+    logger.info(f"Skipping {len(failed_files)} files which previously failed")
+    return failed_files
+
+
+def _update_paths(*, media_dir, changes, library, config, workers):
+    uris_to_remove = _removed_uris(
+        media_dir=media_dir,
+        changes=changes,
+        library=library,
+    )
+
+    file_mtimes = {}
+    file_filter = _file_filter(config, media_dir)
+    for absolute_path in changes.modified:
+        found, errors = mtimes.find_mtimes(
+            absolute_path,
+            follow=config["local"]["scan_follow_symlinks"],
+            thread_count=config["local"]["scan_walk_threads"],
+            file_filter=file_filter,
         )
-        return True
-
-    for absolute_path in file_mtimes:
-        relative_path = absolute_path.relative_to(media_dir)
-        file_uri = absolute_path.as_uri()
-
-        if (
-            not _is_hidden_file(relative_path, file_uri)
-            and _extension_filters(
-                relative_path,
-                file_uri,
-                included_file_exts,
-                excluded_file_exts,
+        file_mtimes.update(found)
+        for path, error in errors.items():
+            logger.debug(f"Error for {path.as_uri()}: {error}")
+
+    failures = library.scan_failures()
+    failed_files = {
+        absolute_path
+        for absolute_path, mtime in file_mtimes.items()
+        if failures.get(translator.path_to_local_track_uri(absolute_path, media_dir))
+        == mtime
+    }
+
+    files_to_update = _find_files_to_scan(
+        file_mtimes=file_mtimes,
+        files_in_library=set(),
+        failed_files=failed_files,
+    )
+
+    logger.info(
+        f"Removing {len(uris_to_remove)} and updating {len(files_to_update)} tracks",
+    )
+    uris = uris_to_remove | {
+        translator.path_to_local_track_uri(absolute_path, media_dir)
+        for absolute_path in files_to_update
+    }
+    # Only what these tracks referenced may be left orphaned by the changes
+    albums, artists = library.track_references(uris)
+    if uris_to_remove:
+        library.remove_tracks(uris_to_remove)
+    _scan_metadata(
+        media_dir=media_dir,
+        file_mtimes=file_mtimes,
+        files=files_to_update,
+        library=library,
+        timeout=config["local"]["scan_timeout"],
+        flush_threshold=config["local"]["scan_flush_threshold"],
+        tracks_limit=None,
+        workers=workers,
+    )
+
+    # A full cleanup is left to close(), as it takes a while on a large library
+    library.cleanup_tracks(uris, albums, artists)
+    library.flush()
+
+
+def _removed_uris(*, media_dir, changes, library):
+    uris_to_remove = set()
+    for absolute_path in changes.removed:
+        local_uri = translator.path_to_local_track_uri(absolute_path, media_dir)
+        # The removed path may be a single track or a whole directory
+        for uri in library.track_uris(local_uri):
+            if uri == local_uri or uri.startswith(local_uri + "/"):
+                logger.debug(f"Removing {uri}: File removed")
+                uris_to_remove.add(uri)
+    return uris_to_remove
+
+
+def _file_filter(config, media_dir):
+    return mtimes.FileFilter(
+        root=media_dir,
+        skip_hidden=True,
+        included_extensions=config["local"]["included_file_extensions"],
+        excluded_extensions=config["local"]["excluded_file_extensions"],
+        include_patterns=config["local"]["scan_include_patterns"],
+        exclude_patterns=config["local"]["scan_exclude_patterns"],
+    )
+
+
+def _scan_filter(config):
+    # Directories recorded with other settings may hold files which are
+    # found or skipped differently now, so they must be walked again
+    return json.dumps(
+        [
+            config["local"][key]
+            for key in (
+                "included_file_extensions",
+                "excluded_file_extensions",
+                "scan_include_patterns",
+                "scan_exclude_patterns",
+                "scan_follow_symlinks",
             )
-            and absolute_path not in files_in_library
-        ):
-            files_to_update.add(absolute_path)
+        ],
+    )
+
+
+def _find_files_to_scan(*, file_mtimes, files_in_library, failed_files):
+    # Hidden files and excluded file extensions are already skipped by the
+    # file filter while finding files
+    files_to_update = file_mtimes.keys() - files_in_library - failed_files
 
     logger.info(f"Found {len(files_to_update)} tracks which need to be updated")
     return files_to_update
@@ -218,70 +470,260 @@ def _scan_metadata(  # noqa: PLR0913
     timeout,
     flush_threshold,
     tracks_limit,
+    workers=1,
 ):
     logger.info("Scanning...")
 
     files = sorted(files)[:tracks_limit]
 
-    scanner = Scanner(timeout)
     progress = _ScanProgress(batch_size=flush_threshold, total=len(files))
 
-    for absolute_path in files:
-        file_uri = absolute_path.as_uri()
-        try:
-            result = scanner.scan(file_uri)
-
-            if not result.playable:
-                logger.warning(
-                    f"Failed scanning {file_uri}: No audio found in file",
-                )
-            elif result.duration is None:
-                logger.warning(
-                    f"Failed scanning {file_uri}: "
-                    "No duration information found in file",
-                )
-            elif result.duration < MIN_DURATION_MS:
-                logger.warning(
-                    f"Failed scanning {file_uri}: "
-                    f"Track shorter than {MIN_DURATION_MS}ms",
-                )
-            else:
+    with _ScanPool(workers=workers, timeout=timeout) as pool:
+        for absolute_path, result, scan_error in pool.scan(files):
+            file_uri = absolute_path.as_uri()
+            try:
                 local_uri = translator.path_to_local_track_uri(
                     absolute_path,
                     media_dir,
                 )
                 mtime = file_mtimes.get(absolute_path)
-                try:
-                    track = convert_tags_to_track(
-                        result.tags,
-                        uri=local_uri,
-                        length=result.duration,
-                        last_modified=mtime,
-                    )
-                except ScannerError as error:
-                    # Index the file without its tags rather than hiding it
-                    # from the library entirely.
-                    logger.warning(f"Ignoring invalid tags on {file_uri}: {error}")
-                    track = Track(
-                        uri=local_uri,
-                        name=absolute_path.name,
-                        length=result.duration,
-                        last_modified=mtime,
-                    )
-                library.add(track, result.tags, result.duration)
-                logger.debug(f"Added {track.uri}")
-        except Exception as error:
-            logger.warning(f"Failed scanning {file_uri}: {error}")
-
-        if progress.increment():
-            progress.log()
-            if library.flush():
-                logger.debug("Progress flushed")
+                reason = _scan_failure_reason(result, scan_error)
+                if result is None or reason is not None:
+                    logger.warning(f"Failed scanning {file_uri}: {reason}")
+                    # Remember the failure, so the file isn't scanned again
+                    # until it is modified.
+                    library.add_scan_failure(local_uri, mtime, reason)
+                else:
+                    try:
+                        track = convert_tags_to_track(
+                            result.tags,
+                            uri=local_uri,
+                            length=result.duration,
+                            last_modified=mtime,
+                        )
+                    except ScannerError as error:
+                        # Index the file without its tags rather than hiding it
+                        # from the library entirely.
+                        logger.warning(f"Ignoring invalid tags on {file_uri}: {error}")
+                        track = Track(
+                            uri=local_uri,
+                            name=absolute_path.name,
+                            length=result.duration,
+                            last_modified=mtime,
+                        )
+                    library.add(track, result.tags, result.duration)
+                    logger.debug(f"Added {track.uri}")
+            except Exception as error:
+                logger.warning(f"Failed scanning {file_uri}: {error}")
+
+            if progress.increment():
+                progress.log()
+                if library.flush():
+                    logger.debug("Progress flushed")
 
     progress.log()
     logger.info("Done scanning")
 
 
+def _scan_failure_reason(result, error):
+    if result is None:
+        return str(error)
+    if not result.playable:
+        return "No audio found in file"
+    if result.duration is None:
+        return "No duration information found in file"
+    if result.duration < MIN_DURATION_MS:
+        return f"Track shorter than {MIN_DURATION_MS}ms"
+    return None
+
+
+class _ScanPool:
+    """Supervised pool of scanner processes.
+
+    Each worker scans files one at a time in a child process, so that a file
+    which crashes or hangs GStreamer only takes down its own worker. Such a
+    worker is replaced, the offending path is recorded in :attr:`failed`, and
+    scanning carries on with the next file. Results are consumed by the
+    calling process only, so that a single connection keeps writing to the
+    library.
+
+    A worker which dies or hangs before its scanner is ready says nothing
+    about the file it was given, so this raises :exc:`ScanWorkerError`
+    instead. ``target`` is the function run by the workers.
+    """
+
+    def __init__(self, *, workers, timeout, target=None):
+        # GStreamer is not fork-safe once initialized, so use fresh processes
+        self._context = multiprocessing.get_context("spawn")
+        self._size = workers
+        self._timeout = timeout
+        self._target = target or _scan_worker_main
+        # Allow for process startup on top of the scanner's own timeout
+        self._deadline = timeout / 1000 + _SCAN_WORKER_GRACE_PERIOD
+        self._workers = []
+        self.failed = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        for worker in self._workers:
+            worker.stop()
+        self._workers = []
+        if self.failed:
+            logger.warning(
+                f"Skipped {len(self.failed)} files which crashed or hung the scanner",
+            )
+        for absolute_path in self.failed:
+            logger.warning(f"Crashed or hung the scanner: {absolute_path.as_uri()}")
+
+    def scan(self, files):
+        """Scan files, yielding ``(path, result, error)`` tuples.
+
+        Results are yielded in completion order rather than in the order of
+        ``files``, so that a slow file doesn't hold back the results of the
+        others. Exactly one of ``result`` and ``error`` is :class:`None`.
+        """
+        pending = iter(files)
+        busy = {}  # connection -> worker
+
+        while True:
+            while len(busy) < self._size:
+                absolute_path = next(pending, None)
+                if absolute_path is None:
+                    break
+                worker = self._idle_worker(busy)
+                worker.submit(absolute_path)
+                busy[worker.connection] = worker
+            if not busy:
+                return
+
+            oldest = min(worker.started for worker in busy.values())
+            ready = multiprocessing.connection.wait(
+                list(busy),
+                timeout=max(0, oldest + self._deadline - time.monotonic()),
+            )
+            for connection in ready:
+                yield from self._receive(busy, connection)
+            yield from self._expire(busy)
+
+    def _receive(self, busy, connection):
+        worker = busy.pop(connection)
+        try:
+            reply = worker.receive()
+        except (EOFError, OSError):
+            absolute_path = worker.path
+            exitcode = worker.restart()
+            message = f"Scanner process died with exit code {exitcode}"
+            yield self._fail(absolute_path, message)
+        else:
+            if reply is None:  # ready, and now scanning the file
+                busy[connection] = worker
+            else:
+                yield worker.path, *reply
+
+    def _expire(self, busy):
+        now = time.monotonic()
+        for connection, worker in list(busy.items()):
+            if now - worker.started > self._deadline:
+                if not worker.ready:
+                    msg = "Scanner process did not start in time"
+                    raise ScanWorkerError(msg)
+                del busy[connection]
+                absolute_path = worker.path
+                worker.restart()
+                yield self._fail(absolute_path, "Scanner process stopped responding")
+
+    def _fail(self, absolute_path, message):
+        self.failed.append(absolute_path)
+        return absolute_path, None, ScannerError(message)
+
+    def _idle_worker(self, busy):
+        for worker in self._workers:
+            if worker.connection not in busy:
+                return worker
+        worker = _ScanWorker(self._context, self._timeout, self._target)
+        self._workers.append(worker)
+        return worker
+
+
+class _ScanWorker:
+    def __init__(self, context, timeout, target):
+        self._context = context
+        self._timeout = timeout
+        self._target = target
+        self.path = None
+        self.started = 0
+        self._start()
+
+    def _start(self):
+        self.ready = False
+        self.connection, child_connection = self._context.Pipe()
+        self._process = self._context.Process(
+            target=self._target,
+            args=(child_connection, self._timeout),
+            daemon=True,
+        )
+        self._process.start()
+        child_connection.close()
+
+    def submit(self, absolute_path):
+        self.path = absolute_path
+        self.started = time.monotonic()
+        self.connection.send(absolute_path)
+
+    def receive(self):
+        """Return the ``(result, error)`` of the file, or None once ready."""
+        try:
+            reply = self.connection.recv()
+        except (EOFError, OSError) as error:
+            if not self.ready:
+                self._kill()
+                msg = (
+                    "Scanner process failed to start, "
+                    f"exit code {self._process.exitcode}"
+                )
+                raise ScanWorkerError(msg) from error
+            raise
+        if reply is None:
+            self.ready = True
+            # Don't count the startup against the file's deadline
+            self.started = time.monotonic()
+        return reply
+
+    def restart(self):
+        exitcode = self._kill()
+        logger.debug(f"Restarting scanner process for {self.path}")
+        self._start()
+        return exitcode
+
+    def stop(self):
+        with contextlib.suppress(OSError):
+            self.connection.send(None)
+        self._process.join(_SCAN_WORKER_GRACE_PERIOD)
+        self._kill()
+
+    def _kill(self):
+        if self._process.is_alive():
+            self._process.kill()
+        self._process.join()
+        self.connection.close()
+        return self._process.exitcode
+
+
+_SCAN_WORKER_GRACE_PERIOD = 10  # Seconds to allow on top of scan timeout.
+
+
+def _scan_worker_main(connection, timeout):
+    scanner = Scanner(timeout)
+    connection.send(None)  # ready
+    while (absolute_path := connection.recv()) is not None:
+        try:
+            connection.send((scanner.scan(absolute_path.as_uri()), None))
+        except Exception as error:
+            connection.send((None, error))
+
+
 class _ScanProgress:
     def __init__(self, *, batch_size, total):
         self.count = 0
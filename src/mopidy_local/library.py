@@ -1,5 +1,7 @@
+import contextlib
+import itertools
 import logging
-import operator
+import queue
 import sqlite3
 from collections.abc import Mapping
 
@@ -8,10 +10,18 @@ from mopidy import backend, models
 from mopidy.models import ModelType, Ref, SearchResult
 from mopidy.types import Uri
 
-from . import Extension, schema
+from . import Extension, cache, schema
 
 logger = logging.getLogger(__name__)
 
+# Maximum number of idle read-only connections kept open for reuse
+POOL_SIZE = 8
+
+# Directory listings that can be browsed page by page
+PAGED_TYPES = (ModelType.ALBUM, ModelType.ARTIST, ModelType.TRACK)
+
+NEXT_PAGE_NAME = "More"
+
 
 def directory_uri(base: Mapping[str, object] | None = None, /, **query: object) -> Uri:
     # Like `dict()`, keywords override keys of the same name in `base`.
@@ -44,24 +54,48 @@ class LocalLibraryProvider(backend.LibraryProvider):
             ref = Ref.directory(uri=Uri(uri), name=name)
             self._directories.append(ref)
         self._dbpath = self._data_dir / "library.db"
-        self._connection = None
+        self._articles = frozenset(
+            map(schema.sort_key, ext_config["sort_ignore_articles"] or ())
+        )
+        self._pool = queue.LifoQueue(POOL_SIZE)
+        self._cache = cache.ResultCache(ext_config["cache_size"], self._data_version)
+        self._version_connection = None
 
     def load(self):
-        with self._connect() as connection:
-            version = schema.load(connection)
-            logger.debug("Using SQLite database schema v%s", version)
-            return schema.count_tracks(connection)
+        connection = self._open()
+        try:
+            with connection:
+                version = schema.load(connection)
+                logger.debug("Using SQLite database schema v%s", version)
+                schema.update_sort_keys(connection, self._articles)
+                return schema.count_tracks(connection)
+        finally:
+            connection.close()
+
+    def close(self):
+        logger.debug("Library result cache: %s", self._cache.info())
+        self._cache.clear()
+        if self._version_connection:
+            self._version_connection.close()
+            self._version_connection = None
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
 
     def lookup(self, uri):
         try:
             if uri.startswith("local:album"):
-                return list(schema.lookup(self._connect(), ModelType.ALBUM, uri))
-            if uri.startswith("local:artist"):
-                return list(schema.lookup(self._connect(), ModelType.ARTIST, uri))
-            if uri.startswith("local:track"):
-                return list(schema.lookup(self._connect(), ModelType.TRACK, uri))
-            msg = "Invalid lookup URI"
-            raise ValueError(msg)  # noqa: TRY301
+                type_ = ModelType.ALBUM
+            elif uri.startswith("local:artist"):
+                type_ = ModelType.ARTIST
+            elif uri.startswith("local:track"):
+                type_ = ModelType.TRACK
+            else:
+                msg = "Invalid lookup URI"
+                raise ValueError(msg)  # noqa: TRY301
+            return list(self._cache.get(("lookup", uri), self._lookup, type_, uri))
         except Exception as e:
             logger.error("Lookup error for %s: %s", uri, e)
             return []
@@ -70,14 +104,11 @@ class LocalLibraryProvider(backend.LibraryProvider):
         try:
             if uri == self.ROOT_DIRECTORY_URI:
                 return self._directories
-            if uri.startswith("local:directory"):
-                return self._browse_directory(uri)
-            if uri.startswith("local:artist"):
-                return self._browse_artist(uri)
-            if uri.startswith("local:album"):
-                return self._browse_album(uri)
-            msg = "Invalid browse URI"
-            raise ValueError(msg)  # noqa: TRY301
+            # What is recent enough changes over time, not only with the
+            # library, so these results can't be cached
+            if "max-age" in dict(uritools.urisplit(uri).getquerylist()):
+                return list(self._browse(uri))
+            return list(self._cache.get(("browse", uri), self._browse, uri))
         except Exception as e:
             logger.error("Error browsing %s: %s", uri, e)
             return []
@@ -97,18 +128,16 @@ class LocalLibraryProvider(backend.LibraryProvider):
             q.extend((field, value) for value in values)
         filters = [f for uri in uris or [] for f in self._filters(uri) if f]
         with self._connect() as c:
-            tracks = schema.search_tracks(c, q, limit, offset, exact, filters)
+            tracks = tuple(schema.search_tracks(c, q, limit, offset, exact, filters))
         uri = Uri(uritools.uricompose("local", path="search", query=q))
-        return SearchResult(uri=uri, tracks=tuple(tracks))
+        return SearchResult(uri=uri, tracks=tracks)
 
     def get_images(self, uris):
         images = {}
-        with self._connect() as c:
-            for uri in uris:
-                if uri.startswith("local:album"):
-                    images[uri] = schema.get_album_images(c, uri)
-                elif uri.startswith("local:track"):
-                    images[uri] = schema.get_track_images(c, uri)
+        for uri in uris:
+            if uri.startswith(("local:album", "local:track")):
+                key = ("images", uri)
+                images[uri] = list(self._cache.get(key, self._get_images, uri))
         return images
 
     def get_distinct(self, field, query=None):
@@ -117,22 +146,84 @@ class LocalLibraryProvider(backend.LibraryProvider):
             q.extend((key, value) for value in values)
         # Gracefully handle both old and new field values for this API.
         compat_field = {"track": "track_name"}.get(field, field)
-        return set(schema.list_distinct(self._connect(), compat_field, q))
+        key = ("distinct", compat_field, tuple(q))
+        return set(self._cache.get(key, self._get_distinct, compat_field, q))
 
+    def cache_info(self):
+        """Return the hits, misses, size and maximum size of the result cache."""
+        return self._cache.info()
+
+    @contextlib.contextmanager
     def _connect(self):
-        if not self._connection:
-            self._connection = sqlite3.connect(
-                self._dbpath,
-                factory=schema.Connection,
-                timeout=self._config["timeout"],
-                check_same_thread=False,
-            )
-        return self._connection
+        # Each caller gets a connection of its own, with its own statement
+        # cache, which it returns to the pool when done.
+        try:
+            connection = self._pool.get_nowait()
+        except queue.Empty:
+            connection = self._open(readonly=True)
+        try:
+            yield connection
+        finally:
+            try:
+                self._pool.put_nowait(connection)
+            except queue.Full:
+                connection.close()
+
+    def _open(self, *, readonly=False):
+        if readonly:
+            database = self._dbpath.absolute().as_uri() + "?mode=ro"
+        else:
+            database = self._dbpath
+        connection = sqlite3.connect(
+            database,
+            factory=schema.Connection,
+            timeout=self._config["timeout"],
+            check_same_thread=False,
+            uri=readonly,
+        )
+        if not readonly:
+            schema.set_journal_mode(connection, self._config["journal_mode"])
+        return connection
+
+    def _data_version(self):
+        # Only commits by other connections change a connection's data
+        # version, so this uses one of its own, guarded by the cache's lock.
+        if self._version_connection is None:
+            self._version_connection = self._open(readonly=True)
+        return schema.data_version(self._version_connection)
+
+    # The results of the following are cached, and returned as copies
+    # so callers can't change them.
+
+    def _lookup(self, type_, uri):
+        with self._connect() as c:
+            return tuple(schema.lookup(c, type_, uri))
+
+    def _browse(self, uri):
+        if uri.startswith("local:directory"):
+            return tuple(self._browse_directory(uri))
+        if uri.startswith("local:artist"):
+            return tuple(self._browse_artist(uri))
+        if uri.startswith("local:album"):
+            return tuple(self._browse_album(uri))
+        msg = "Invalid browse URI"
+        raise ValueError(msg)
+
+    def _get_images(self, uri):
+        with self._connect() as c:
+            if uri.startswith("local:album"):
+                return tuple(schema.get_album_images(c, uri))
+            return tuple(schema.get_track_images(c, uri))
+
+    def _get_distinct(self, field, query):
+        with self._connect() as c:
+            return frozenset(schema.list_distinct(c, field, query))
 
     def _browse_album(self, uri, order=("disc_no", "track_no", "name")):
-        return schema.browse(self._connect(), ModelType.TRACK, order, album=uri)
+        with self._connect() as c:
+            return schema.browse(c, ModelType.TRACK, order, album=uri)
 
-    def _browse_artist(self, uri, order=("type", "name COLLATE NOCASE")):
+    def _browse_artist(self, uri, order=("type", "sortkey", "uri")):
         with self._connect() as c:
             albums = schema.browse(c, ModelType.ALBUM, order, albumartist=uri)
             refs = schema.browse(c, order=order, artist=uri)
@@ -153,31 +244,38 @@ class LocalLibraryProvider(backend.LibraryProvider):
                 tracks.append(ref)
             else:
                 logger.debug("Skipped SQLite browse result %s", ref.uri)
-        albums.sort(key=operator.attrgetter("name"))
+        albums.sort(key=lambda ref: schema.sort_key(ref.name, self._articles))
         return albums + tracks
 
-    def _browse_directory(self, uri, order=("type", "name COLLATE NOCASE")):
-        query = dict(uritools.urisplit(uri).getquerylist())
+    def _browse_directory(self, uri):
+        params = dict(uritools.urisplit(uri).getquerylist())
+        query = params.copy()
         type_ = query.pop("type", None)
         role = query.pop("role", None)
+        paged = query.pop("limit", None) is not None and type_ in PAGED_TYPES
+        query.pop("after", None)
+        query.pop("after_uri", None)
 
         # TODO: handle these in schema (generically)?
         if type_ == "date":
             format_ = query.get("format") or "%Y-%m-%d"
-            return list(map(date_ref, schema.dates(self._connect(), format=format_)))
+            with self._connect() as c:
+                return list(map(date_ref, schema.dates(c, format=format_)))
         if type_ == "genre":
-            return list(map(genre_ref, schema.list_distinct(self._connect(), "genre")))
+            with self._connect() as c:
+                return list(map(genre_ref, schema.list_distinct(c, "genre")))
 
-        # Fix #38: keep sort order of album tracks; this also applies
-        # to composers and performers
-        if type_ == ModelType.TRACK and "album" in query:
-            order = ("disc_no", "track_no", "name")
-        if type_ == ModelType.ARTIST and self._config["use_artist_sortname"]:
-            order = ("coalesce(sortname, name) COLLATE NOCASE",)
+        order = self._browse_order(type_, query)
         roles = role or ("artist", "albumartist")  # TODO: re-think 'roles'...
 
+        if paged:
+            results, more = self._browse_page(params, role=roles, **query)
+        else:
+            with self._connect() as c:
+                results = schema.browse(c, type_, order, role=roles, **query)
+            more = []
         refs = []
-        for ref in schema.browse(self._connect(), type_, order, role=roles, **query):
+        for ref in results:
             if ref.type == ModelType.TRACK or (not query and not role):
                 refs.append(ref)
             elif ref.type == ModelType.ALBUM:
@@ -196,7 +294,48 @@ class LocalLibraryProvider(backend.LibraryProvider):
                 )
             else:
                 logger.warning("Unexpected SQLite browse result: %r", ref)
-        return refs
+        return refs + more
+
+    def _browse_order(self, type_, query):
+        # Fix #38: keep sort order of album tracks; this also applies
+        # to composers and performers
+        if type_ == ModelType.TRACK and "album" in query:
+            return ("disc_no", "track_no", "name")
+        if type_ == ModelType.ARTIST and self._config["use_artist_sortname"]:
+            return ("sortname_key", "uri")
+        if type_ in PAGED_TYPES:
+            return ("sortkey", "uri")  # along the sort key index
+        return ("type", "sortkey", "uri")
+
+    def _browse_page(self, params, **kwargs):
+        # Returns up to `limit` refs after the sort key and URI given by
+        # `after` and `after_uri`, and a ref to the next page if there is one
+        type_, limit = params["type"], int(params["limit"])
+        if limit < 1:
+            msg = f"Invalid browse limit: {limit}"
+            raise ValueError(msg)
+        if type_ == ModelType.ARTIST and self._config["use_artist_sortname"]:
+            key = "sortname_key"
+        else:
+            key = "name_key"
+        if "after" in params:
+            after = (params["after"], params.get("after_uri", ""))
+        else:
+            after = None
+        with (
+            self._connect() as c,
+            contextlib.closing(
+                schema.iter_browse(c, type_, key, after, **kwargs)
+            ) as rows,
+        ):
+            # one more than requested, to know if there is a next page
+            page = list(itertools.islice(rows, limit + 1))
+        if len(page) <= limit:
+            return [ref for _, ref in page], []
+        sortkey, last = page[limit - 1]
+        uri = directory_uri(params, after=sortkey, after_uri=last.uri)
+        more = Ref.directory(uri=uri, name=NEXT_PAGE_NAME)
+        return [ref for _, ref in page[:limit]], [more]
 
     def _filters(self, uri):
         if uri.startswith("local:directory"):
@@ -1,10 +1,15 @@
+import logging
+import os
 import pathlib
 import queue
+import re
 import stat
 import threading
 
 from mopidy import exceptions
 
+logger = logging.getLogger(__name__)
+
 
 class FindError(exceptions.MopidyException):
     def __init__(self, message, errno=None):
@@ -12,88 +17,409 @@ class FindError(exceptions.MopidyException):
         self.errno = errno
 
 
-def find_mtimes(root, *, follow=False):
-    results, errors = _find(root, relative=False, follow=follow)
+class FileFilter:
+    """Decides which files and directories to skip while searching.
+
+    Directories are skipped before they are searched, and files before they
+    are stat'ed. All rules are compiled into a few regular expressions, which
+    are matched against the paths as given by :func:`os.scandir`, so that no
+    strings need to be built per file.
+
+    Patterns use the gitignore syntax, e.g. ``*.part`` or ``**/Samples/**``,
+    and are matched against paths relative to ``root``. A pattern without a
+    slash matches a name at any depth, a pattern ending with a slash only
+    matches directories. Negated patterns are not supported.
+
+    :param Path root: directory which patterns are relative to, defaults to
+        the search root
+    :param bool skip_hidden: if names starting with a dot should be skipped
+    :param list included_extensions: if set, only files with one of these
+        extensions, or matching ``include_patterns``, are kept
+    :param list excluded_extensions: files with one of these extensions are
+        skipped, unless ``included_extensions`` is set
+    :param list include_patterns: if set, only files matching one of these
+        patterns, or with one of ``included_extensions``, are kept
+    :param list exclude_patterns: files and directories matching any of these
+        patterns are skipped
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        *,
+        root=None,
+        skip_hidden=False,
+        included_extensions=None,
+        excluded_extensions=None,
+        include_patterns=None,
+        exclude_patterns=None,
+    ):
+        self.root = root
+        hidden = [r"(?:.*/)?\.[^/]*"] if skip_hidden else []
+        excluded_extensions = [] if included_extensions else excluded_extensions
+        exclude_patterns = exclude_patterns or []
+        self._dirs = _compile_alternatives(
+            hidden=hidden,
+            pattern=[_translate(p, dirs=True) for p in exclude_patterns],
+        )
+        self._files = _compile_alternatives(
+            hidden=hidden,
+            pattern=[_translate(p, dirs=False) for p in exclude_patterns],
+            extension=[_translate_extensions(excluded_extensions)],
+        )
+        self._included_files = _compile_alternatives(
+            included=[
+                _translate_extensions(included_extensions),
+                *(_translate(p, dirs=False) for p in include_patterns or []),
+            ],
+        )
+
+    def excludes_dir(self, path, pos=0):
+        """Get the reason to skip a directory, or :class:`None`.
+
+        :param str path: path of the directory
+        :param int pos: index in ``path`` where the path relative to the root
+            directory starts
+        """
+        if self._dirs and (match := self._dirs.fullmatch(path, pos)):
+            return _DIR_REASONS[match.lastgroup]
+        return None
+
+    def excludes_file(self, path, pos=0):
+        """Get the reason to skip a file, or :class:`None`.
+
+        :param str path: path of the file
+        :param int pos: index in ``path`` where the path relative to the root
+            directory starts
+        """
+        if self._files and (match := self._files.fullmatch(path, pos)):
+            return _FILE_REASONS[match.lastgroup]
+        if self._included_files and not self._included_files.fullmatch(path, pos):
+            return "File not on included list"
+        return None
+
+    def excludes_path(self, relative_path, *, is_dir=False):
+        """Get the reason to skip the file or directory at ``relative_path``.
+
+        Unlike :meth:`excludes_dir` and :meth:`excludes_file`, all of the
+        parent directories in ``relative_path`` are checked as well.
+        """
+        path = relative_path.as_posix()
+        end = path.find("/")
+        while end != -1:
+            if reason := self.excludes_dir(path[:end]):
+                return reason
+            end = path.find("/", end + 1)
+        if is_dir:
+            return self.excludes_dir(path)
+        return self.excludes_file(path)
+
+
+_DIR_REASONS = {
+    "hidden": "Hidden directory",
+    "pattern": "Directory matches an excluded pattern",
+}
+_FILE_REASONS = {
+    "hidden": "Hidden file",
+    "pattern": "File matches an excluded pattern",
+    "extension": "File extension on excluded list",
+}
+
+
+def _compile_alternatives(**alternatives):
+    groups = []
+    for name, regexes in alternatives.items():
+        if regexes := [regex for regex in regexes if regex is not None]:
+            groups.append(f"(?P<{name}>{'|'.join(regexes)})")
+    if not groups:
+        return None
+    return re.compile("|".join(groups), re.DOTALL)
+
+
+def _translate_extensions(extensions):
+    if not extensions:
+        return None
+    # Same as matching Path.suffix, ignoring case
+    suffixes = "|".join(re.escape(ext.lower()) for ext in extensions)
+    return rf"(?:.*/)?[^/]+(?i:{suffixes})"
+
+
+def _translate(pattern, *, dirs):  # noqa: C901
+    """Translate a gitignore-style pattern to a regular expression.
+
+    :param str pattern: the pattern to translate
+    :param bool dirs: if the expression should match directories, as opposed
+        to files
+    :returns: regular expression, or :class:`None` if the pattern can't match
+    """
+    if pattern.endswith("/"):
+        if not dirs:
+            return None
+        pattern = pattern.rstrip("/")
+    # Patterns with a slash before the end are relative to the root directory
+    anchored = "/" in pattern
+    pattern = pattern.removeprefix("/")
+
+    parts = [] if anchored else ["(?:.*/)?"]
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i) and (i == 0 or pattern[i - 1] == "/"):
+            parts.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("/**", i) and i + 3 == len(pattern):
+            # A directory matches if everything inside of it does
+            parts.append("(?:/.*)?" if dirs else "/.*")
+            i += 3
+        elif pattern.startswith("**", i):
+            parts.append(".*")
+            i += 2
+        elif pattern[i] == "*":
+            parts.append("[^/]*")
+            i += 1
+        elif pattern[i] == "?":
+            parts.append("[^/]")
+            i += 1
+        elif pattern[i] == "[" and (end := pattern.find("]", i + 2)) != -1:
+            chars = pattern[i + 1 : end].replace("\\", "\\\\")
+            if chars.startswith("!"):
+                chars = "^/" + chars[1:]
+            parts.append(f"[{chars}]")
+            i = end + 1
+        elif pattern[i] == "\\" and i + 1 < len(pattern):
+            parts.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            parts.append(re.escape(pattern[i]))
+            i += 1
+    return "".join(parts)
+
+
+DEFAULT_THREAD_COUNT = 10
+
+
+def find_mtimes(
+    root,
+    *,
+    follow=False,
+    thread_count=DEFAULT_THREAD_COUNT,
+    file_filter=None,
+):
+    results, _, errors = _find(
+        root,
+        thread_count=thread_count,
+        relative=False,
+        follow=follow,
+        file_filter=file_filter,
+    )
 
     # return the mtimes as integer milliseconds
-    mtimes = {f: int(st.st_mtime * 1000) for f, st in results.items()}
+    mtimes = {f: _mtime(st) for f, st in results.items()}
 
     return mtimes, errors
 
 
-def _find(root, *, thread_count=10, relative=False, follow=False):
+def find_changed_mtimes(
+    root,
+    dir_mtimes,
+    *,
+    follow=False,
+    thread_count=DEFAULT_THREAD_COUNT,
+    file_filter=None,
+):
+    """Like :func:`find_mtimes`, but skip files in unchanged directories.
+
+    The files in a directory whose mtime matches the one in ``dir_mtimes`` are
+    neither listed in the results nor stat'ed, though its subdirectories are
+    still searched. Note that modifying a file in place does not change the
+    mtime of its directory, so such changes go unnoticed.
+
+    :param Path root: root directory to search from
+    :param dict dir_mtimes: directory mtimes from a previous search
+    :param bool follow: if symlinks should be followed
+    :param int thread_count: number of threads to search with
+    :param FileFilter file_filter: files and directories to skip
+    :returns: tuple of file mtimes, directory mtimes, set of unchanged
+        directories, and errors
+    """
+    results, dirs, errors = _find(
+        root,
+        thread_count=thread_count,
+        relative=False,
+        follow=follow,
+        known_dirs=dir_mtimes,
+        file_filter=file_filter,
+    )
+
+    mtimes = {f: _mtime(st) for f, st in results.items()}
+    new_dir_mtimes = {d: _mtime(st) for d, st in dirs.items()}
+    unchanged_dirs = {
+        d for d, mtime in new_dir_mtimes.items() if dir_mtimes.get(d) == mtime
+    }
+
+    return mtimes, new_dir_mtimes, unchanged_dirs, errors
+
+
+def _mtime(st):
+    return int(st.st_mtime * 1000)
+
+
+def _find(  # noqa: PLR0913
+    root,
+    *,
+    thread_count=DEFAULT_THREAD_COUNT,
+    relative=False,
+    follow=False,
+    known_dirs=None,
+    file_filter=None,
+):
     """Threaded find implementation that provides stat results for files.
 
-    Tries to protect against sym/hardlink loops by keeping an eye on parent
-    (st_dev, st_ino) pairs.
+    Tries to protect against sym/hardlink loops by keeping track of the
+    (st_dev, st_ino) pairs of all directories searched so far. As a
+    consequence, a directory which can be reached through several symlinks is
+    only searched once.
 
     :param Path root: root directory to search from, may not be a file
     :param int thread_count: number of workers to use, mainly useful to
         mitigate network lag when scanning on NFS etc.
     :param bool relative: if results should be relative to root or absolute
     :param bool follow: if symlinks should be followed
+    :param dict known_dirs: directory mtimes, files in directories which
+        still have the same mtime are skipped
+    :param FileFilter file_filter: files and directories to skip
     """
     root = pathlib.Path(root).resolve()
-    threads = []
-    results = {}
-    errors = {}
-    done = threading.Event()
-    work = queue.Queue()
-    work.put((root, []))
-
-    if not relative:
-        root = None
-
-    args = (root, follow, done, work, results, errors)
-    for _ in range(thread_count):
-        t = threading.Thread(target=_find_worker, args=args)
-        t.daemon = True
-        t.start()
-        threads.append(t)
-
-    work.join()
-    done.set()
-    for t in threads:
-        t.join()
-    return results, errors
-
-
-def _find_worker(root, follow, done, work, results, errors):  # noqa: PLR0913, PLR0917
-    """Worker thread for collecting stat() results.
-
-    :param Path root: directory to make results relative to
-    :param bool follow: if symlinks should be followed
-    :param threading.Event done: event indicating that all work has been done
-    :param queue.Queue work: queue of paths to process
-    :param dict results: shared dictionary for storing all the stat() results
-    :param dict errors: shared dictionary for storing any per path errors
+    walker = _Walker(
+        relative_to=root if relative else None,
+        follow=follow,
+        known_dirs=known_dirs or {},
+        file_filter=file_filter or FileFilter(),
+    )
+    walker.walk(root, thread_count=thread_count)
+    return walker.results, walker.dirs, walker.errors
+
+
+class _Walker:
+    """Collects stat() results for all files below a root directory.
+
+    Directories are handed out to the worker threads through a blocking
+    queue. Each directory is listed with :func:`os.scandir`, so that the file
+    type of each entry is usually known without a stat() call, and the one
+    stat() call per entry that remains is cached by its :class:`os.DirEntry`.
     """
-    while not done.is_set():
+
+    def __init__(self, *, relative_to, follow, known_dirs, file_filter):
+        self._relative_to = relative_to
+        self._follow = follow
+        self._known_dirs = known_dirs
+        self._file_filter = file_filter
+        self._pos = 0
+        self._work = queue.Queue()
+        self._visited = set()
+        self._visited_lock = threading.Lock()
+        self.results = {}
+        self.dirs = {}
+        self.errors = {}
+
+    def walk(self, root, *, thread_count):
         try:
-            entry, parents = work.get(block=False)
-        except queue.Empty:
-            continue
+            st = root.stat() if self._follow else root.lstat()
+        except OSError as exc:
+            self.errors[self._key(root)] = FindError(exc.strerror, exc.errno)
+            return
+        is_dir = stat.S_ISDIR(st.st_mode)
+        base = self._file_filter.root
+        if base is None or not root.is_relative_to(base):
+            base = root if is_dir else root.parent
+        # Index where the paths relative to the filter root start
+        self._pos = len(str(base).rstrip("/")) + 1
+        if root != base and (
+            reason := self._file_filter.excludes_path(
+                root.relative_to(base),
+                is_dir=is_dir,
+            )
+        ):
+            self._skip(root, reason)
+            return
+        self._add(root, st)
+        if self._work.empty():
+            return
+
+        threads = [
+            threading.Thread(target=self._worker, daemon=True)
+            for _ in range(max(thread_count, 1))
+        ]
+        for t in threads:
+            t.start()
+        self._work.join()
+        for _ in threads:
+            self._work.put(None)
+        for t in threads:
+            t.join()
 
-        path = entry.relative_to(root) if root else entry
+    def _worker(self):
+        while (item := self._work.get()) is not None:
+            try:
+                self._scan_dir(*item)
+            finally:
+                self._work.task_done()
 
+    def _scan_dir(self, path, st):
+        # Only the subdirectories of an unchanged directory are of interest
+        dirs_only = self._known_dirs.get(self._key(path)) == _mtime(st)
         try:
-            st = entry.stat() if follow else entry.lstat()
-
-            if (st.st_dev, st.st_ino) in parents:
-                errors[path] = FindError("Sym/hardlink loop found.")
-                continue
-
-            if stat.S_ISDIR(st.st_mode):
-                for e in entry.iterdir():
-                    work.put((e, [*parents, (st.st_dev, st.st_ino)]))
-            elif stat.S_ISREG(st.st_mode):
-                results[path] = st
-            elif stat.S_ISLNK(st.st_mode):
-                errors[path] = FindError("Not following symlinks.")
-            else:
-                errors[path] = FindError("Not a file or directory.")
+            with os.scandir(path) as it:
+                for entry in it:
+                    self._scan_entry(path, entry, dirs_only=dirs_only)
+        except OSError as exc:
+            self.errors[self._key(path)] = FindError(exc.strerror, exc.errno)
 
+    def _scan_entry(self, parent, entry, *, dirs_only):
+        try:
+            if entry.is_dir(follow_symlinks=self._follow):
+                reason = self._file_filter.excludes_dir(entry.path, self._pos)
+            elif dirs_only:
+                return
+            else:
+                reason = self._file_filter.excludes_file(entry.path, self._pos)
+            if reason:
+                # Most skipped entries are never logged, so only then build a path
+                if logger.isEnabledFor(logging.DEBUG):
+                    self._skip(parent / entry.name, reason)
+                return
+            path = parent / entry.name
+            if not self._follow and entry.is_symlink():
+                self.errors[self._key(path)] = FindError("Not following symlinks.")
+                return
+            st = entry.stat(follow_symlinks=self._follow)
         except OSError as exc:
-            errors[path] = FindError(exc.strerror, exc.errno)
-        finally:
-            work.task_done()
+            path = parent / entry.name
+            self.errors[self._key(path)] = FindError(exc.strerror, exc.errno)
+            return
+        self._add(path, st)
+
+    def _add(self, path, st):
+        if stat.S_ISDIR(st.st_mode):
+            st_key = (st.st_dev, st.st_ino)
+            with self._visited_lock:
+                seen = st_key in self._visited
+                self._visited.add(st_key)
+            if seen:
+                self.errors[self._key(path)] = FindError("Sym/hardlink loop found.")
+                return
+            self.dirs[self._key(path)] = st
+            self._work.put((path, st))
+        elif stat.S_ISREG(st.st_mode):
+            self.results[self._key(path)] = st
+        elif stat.S_ISLNK(st.st_mode):
+            self.errors[self._key(path)] = FindError("Not following symlinks.")
+        else:
+            self.errors[self._key(path)] = FindError("Not a file or directory.")
+
+    def _skip(self, path, reason):
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Skipped {path.as_uri()}: {reason}")
+
+    def _key(self, path):
+        if self._relative_to is None:
+            return path
+        return path.relative_to(self._relative_to)
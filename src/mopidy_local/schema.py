@@ -1,13 +1,18 @@
+import contextlib
 import logging
 import operator
 import pathlib
 import re
 import sqlite3
+import time
+import unicodedata
 
 from mopidy.models import Album, Artist, Image, ModelType, Ref, Track
 
 _IMAGE_SIZE_RE = re.compile(r".*-(\d+)x(\d+)\.(?:png|gif|jpeg)$")
 
+_DATE_RE = re.compile(r"(\d{4})(?:-(\d{2})(?:-\d{2})?)?")
+
 _IMAGES_QUERY = "SELECT images FROM album WHERE images IS NOT NULL"
 
 _ALBUM_IMAGE_QUERY = "SELECT images FROM album WHERE uri = ?"
@@ -24,32 +29,43 @@ _BROWSE_QUERIES = {
     SELECT CASE WHEN album.uri IS NULL THEN
            '{ModelType.TRACK}' ELSE '{ModelType.ALBUM}' END AS type,
            coalesce(album.uri, track.uri) AS uri,
-           coalesce(album.name, track.name) AS name
+           coalesce(album.name, track.name) AS name,
+           coalesce(album.name_key, track.name_key) AS sortkey
       FROM track LEFT OUTER JOIN album ON track.album = album.uri
      WHERE %s
      GROUP BY coalesce(album.uri, track.uri)
      ORDER BY %s
     """,  # noqa: S608
     ModelType.ALBUM: f"""
-    SELECT '{ModelType.ALBUM}' AS type, uri AS uri, name AS name
+    SELECT '{ModelType.ALBUM}' AS type, uri AS uri, name AS name,
+           name_key AS sortkey
       FROM album
      WHERE %s
      ORDER BY %s
     """,  # noqa: S608
     ModelType.ARTIST: f"""
-    SELECT '{ModelType.ARTIST}' AS type, uri AS uri, name AS name
+    SELECT '{ModelType.ARTIST}' AS type, uri AS uri, name AS name,
+           name_key AS sortkey
       FROM artist
      WHERE %s
      ORDER BY %s
      """,  # noqa: S608
     ModelType.TRACK: f"""
-    SELECT '{ModelType.TRACK}' AS type, uri AS uri, name AS name
+    SELECT '{ModelType.TRACK}' AS type, uri AS uri, name AS name,
+           name_key AS sortkey
       FROM track
      WHERE %s
      ORDER BY %s
     """,  # noqa: S608
 }
 
+# Tables of browse results that can be read in pages
+_BROWSE_TABLES = {
+    ModelType.ALBUM: "album",
+    ModelType.ARTIST: "artist",
+    ModelType.TRACK: "track",
+}
+
 _BROWSE_FILTERS = {
     None: {
         "album": "track.album = ?",
@@ -57,9 +73,11 @@ _BROWSE_FILTERS = {
         "artist": "track.artists = ?",
         "composer": "track.composers = ?",
         "date": "track.date LIKE ? || '%'",
+        "year": "track.year = ?",
+        "year_month": "track.year_month = ?",
         "genre": "track.genre = ?",
         "performer": "track.performers = ?",
-        "max-age": "track.last_modified >= (strftime('%s', 'now') - ?) * 1000",
+        "max-age": "track.last_modified >= ?",
     },
     ModelType.ARTIST: {
         "role": {
@@ -88,18 +106,15 @@ _BROWSE_FILTERS = {
         "date": """EXISTS (
             SELECT * FROM track WHERE album = album.uri AND date LIKE ? || '%'
         )""",
+        "year": "uri IN (SELECT album FROM track WHERE year = ?)",
+        "year_month": "uri IN (SELECT album FROM track WHERE year_month = ?)",
         "genre": """? IN (
             SELECT genre FROM track WHERE album = album.uri
         )""",
         "performer": """? IN (
             SELECT performers FROM track WHERE album = album.uri
         )""",
-        "max-age": """EXISTS (
-            SELECT *
-              FROM track
-             WHERE album = album.uri
-               AND last_modified >= (strftime('%s', 'now') - ?) * 1000
-        )""",
+        "max-age": "last_modified >= ?",
     },
     ModelType.TRACK: {
         "album": "album = ?",
@@ -109,9 +124,11 @@ _BROWSE_FILTERS = {
         "artist": "artists = ?",
         "composer": "composers = ?",
         "date": "date LIKE ? || '%'",
+        "year": "year = ?",
+        "year_month": "year_month = ?",
         "genre": "genre = ?",
         "performer": "performers = ?",
-        "max-age": "last_modified >= (strftime('%s', 'now') - ?) * 1000",
+        "max-age": "last_modified >= ?",
     },
 }
 
@@ -119,20 +136,175 @@ _LOOKUP_QUERIES = {
     ModelType.ALBUM: """
     SELECT * FROM tracks WHERE album_uri = ?
     """,
+    # A union rather than `?1 IN (artist_uri, albumartist_uri)`, so that
+    # both the track and album artists indexes are used
     ModelType.ARTIST: """
-    SELECT * FROM tracks WHERE ? IN (artist_uri, albumartist_uri)
+    SELECT *
+      FROM tracks
+     WHERE docid IN (
+            SELECT rowid FROM track WHERE artists = ?1
+             UNION
+            SELECT track.rowid
+              FROM album JOIN track ON track.album = album.uri
+             WHERE album.artists = ?1
+           )
+     ORDER BY album_name, album_uri, disc_no, track_no, name, uri
     """,
     ModelType.TRACK: """
     SELECT * FROM tracks WHERE uri = ?
     """,
 }
 
+# Same checks as the model validation in _tracks(), for rows which must be
+# rescanned; see mopidy-local#92
+_VALID_DATE = """({0} IS NULL
+    OR {0} GLOB '[0-9][0-9][0-9][0-9]'
+    OR {0} GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]'
+    OR {0} GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]')"""
+
+_TRACK_MTIMES_QUERY = f"""
+SELECT track.uri AS uri,
+       CASE WHEN {_VALID_DATE.format("track.date")}
+             AND {_VALID_DATE.format("album.date")}
+             AND coalesce(track.track_no, 0) >= 0
+             AND coalesce(track.disc_no, 0) >= 0
+             AND coalesce(track.bitrate, 0) >= 0
+             AND coalesce(album.num_tracks, 0) >= 0
+             AND coalesce(album.num_discs, 0) >= 0
+            THEN track.last_modified
+       END AS last_modified
+  FROM track
+  LEFT OUTER JOIN album ON track.album = album.uri
+"""  # noqa: S608
+
+_ARTIST_COLUMNS = (
+    "uri",
+    "name",
+    "sortname",
+    "musicbrainz_id",
+    "name_key",
+    "sortname_key",
+)
+
+_ALBUM_COLUMNS = (
+    "uri",
+    "name",
+    "artists",
+    "num_tracks",
+    "num_discs",
+    "date",
+    "musicbrainz_id",
+    "images",
+    "name_key",
+)
+
+_TRACK_COLUMNS = (
+    "uri",
+    "name",
+    "album",
+    "artists",
+    "composers",
+    "performers",
+    "genre",
+    "track_no",
+    "disc_no",
+    "date",
+    "length",
+    "bitrate",
+    "comment",
+    "musicbrainz_id",
+    "last_modified",
+    "name_key",
+    "year",
+    "year_month",
+)
+
+# Unlike INSERT OR REPLACE, updates an existing row in place, keeping its
+# rowid, and by default leaves it alone if it is unchanged
+_UPSERT_SQL = """
+INSERT INTO {0} ({1}) VALUES ({2})
+    ON CONFLICT (uri) DO UPDATE SET ({1}) = ({3})
+ WHERE {4}
+"""
+
+
+def _upsert_sql(table, columns, *, changed_only=True):
+    names = ", ".join(columns)
+    values = ", ".join(f"excluded.{column}" for column in columns)
+    return _UPSERT_SQL.format(
+        table,
+        names,
+        ", ".join("?" * len(columns)),
+        values,
+        f"({names}) IS NOT ({values})" if changed_only else "true",
+    )
+
+
+_UPSERT_ARTIST_SQL = _upsert_sql("artist", _ARTIST_COLUMNS)
+
+_UPSERT_ALBUM_SQL = _upsert_sql("album", _ALBUM_COLUMNS)
+
+_UPSERT_TRACK_SQL = _upsert_sql("track", _TRACK_COLUMNS)
+
+_UPDATE_TRACK_SQL = _upsert_sql("track", _TRACK_COLUMNS, changed_only=False)
+
+# Triggers maintaining the search table and full-text index
+_SEARCH_TRIGGERS = (
+    "search_after_insert",
+    "search_after_delete",
+    "track_after_insert",
+    "track_after_update",
+    "track_after_delete",
+    "album_after_update",
+    "artist_after_update",
+)
+
+# Sort key columns, and the expressions they are computed from
+_SORT_KEYS = {
+    "artist": {"name_key": "name", "sortname_key": "coalesce(sortname, name)"},
+    "album": {"name_key": "name"},
+    "track": {"name_key": "name"},
+}
+
+_DELETE_FROM_FTS_SQL = """
+INSERT INTO fts (
+    fts,
+    rowid,
+    uri,
+    track_name,
+    album,
+    artist,
+    composer,
+    performer,
+    albumartist,
+    genre,
+    track_no,
+    disc_no,
+    date,
+    comment,
+    musicbrainz_trackid,
+    musicbrainz_albumid,
+    musicbrainz_artistid
+) SELECT 'delete', * FROM search WHERE docid IN (%s)
+"""
+
 _SEARCH_SQL = """
 SELECT *
   FROM tracks
  WHERE docid IN (SELECT docid FROM %s WHERE %s)
 """
 
+# Exact match of any search field, looked up in the search_value table
+_ANY_VALUE_FILTER = "docid IN (SELECT docid FROM search_value WHERE value = ?)"
+
+_FULLTEXT_SEARCH_SQL = """
+SELECT tracks.*
+  FROM tracks
+  JOIN (SELECT rowid, rank FROM fts WHERE fts MATCH ?) AS hits
+    ON tracks.docid = hits.rowid
+ WHERE 1
+"""
+
 _SEARCH_FILTERS = {
     "album": "album_uri = ?",
     "albumartist": "albumartist_uri = ?",
@@ -141,7 +313,7 @@ _SEARCH_FILTERS = {
     "date": "date LIKE ? || '%'",
     "genre": "genre = ?",
     "performer": "performer_uri = ?",
-    "max-age": "last_modified >= (strftime('%s', 'now') - ?) * 1000",
+    "max-age": "last_modified >= ?",
 }
 
 _SEARCH_FIELDS = {
@@ -162,7 +334,7 @@ _SEARCH_FIELDS = {
     "musicbrainz_artistid",
 }
 
-schema_version = 7
+schema_version = 19
 
 logger = logging.getLogger(__name__)
 
@@ -195,13 +367,96 @@ def load(c):
             msg = "Database schema upgrade failed"
             raise AssertionError(msg)
         user_version = new_version
+    if fulltext_rebuild_pending(c):
+        logger.info("Rebuilding full-text index of an interrupted scan")
+        rebuild_fulltext_index(c)
     return user_version
 
 
+def set_journal_mode(c, mode):
+    try:
+        (result,) = c.execute(f"PRAGMA journal_mode = {mode}").fetchone()
+    except sqlite3.OperationalError as e:
+        logger.warning("Error setting SQLite journal mode to %s: %s", mode, e)
+        return None
+    if result != mode:
+        logger.warning("Using SQLite journal mode %s instead of %s", result, mode)
+    return result
+
+
+def checkpoint(c, mode="PASSIVE"):
+    # Does nothing unless in WAL mode
+    c.execute(f"PRAGMA wal_checkpoint({mode})")
+
+
+def sort_key(name, articles=()):
+    """Return a key for sorting `name` regardless of case and accents.
+
+    If the first word of `name` is one of `articles`, which must be sort keys
+    themselves, it is ignored unless nothing else follows.
+    """
+    if name.isascii():
+        key = name.casefold()
+    else:
+        decomposed = unicodedata.normalize("NFKD", name)
+        key = "".join(c for c in decomposed if not unicodedata.combining(c))
+        key = key.casefold()
+    article, _, rest = key.partition(" ")
+    if article in articles and rest.strip():
+        return rest.lstrip()
+    return key
+
+
+def update_sort_keys(c, articles=()):
+    """Compute sort keys that are missing or were computed with other articles.
+
+    Returns the number of rows updated.
+    """
+    key = _sort_key_func(articles)
+    updates = []
+    for table, columns in _SORT_KEYS.items():
+        names, exprs = ", ".join(columns), ", ".join(columns.values())
+        rows = []
+        for uri, *values in c.execute(f"SELECT uri, {exprs}, {names} FROM {table}"):  # noqa: S608
+            keys = [key(value) for value in values[: len(columns)]]
+            if keys != values[len(columns) :]:
+                rows.append((*keys, uri))
+        if rows:
+            assignments = ", ".join(f"{name} = ?" for name in columns)
+            sql = f"UPDATE {table} SET {assignments} WHERE uri = ?"  # noqa: S608
+            updates.append((sql, rows))
+    if updates:
+        # sort keys are not part of the search table
+        with (
+            _savepoint(c, "update_sort_keys"),
+            _triggers_dropped(
+                c, "track_after_update", "album_after_update", "artist_after_update"
+            ),
+        ):
+            for sql, rows in updates:
+                c.executemany(sql, rows)
+    return sum(len(rows) for _, rows in updates)
+
+
+def data_version(c):
+    # Changes whenever another connection commits to the database
+    return c.execute("PRAGMA data_version").fetchone()[0]
+
+
 def tracks(c):
     return _tracks(c.execute("SELECT * FROM tracks"))
 
 
+def track_mtimes(c):
+    """Get a cursor over the ``(uri, last_modified)`` pairs of all tracks.
+
+    Unlike :func:`tracks`, this doesn't create any models. Instead,
+    ``last_modified`` is :class:`None` for any track which :func:`tracks`
+    would skip due to invalid data.
+    """
+    return c.execute(_TRACK_MTIMES_QUERY)
+
+
 def list_distinct(c, field, query=()):
     if field not in _SEARCH_FIELDS:
         msg = f"Invalid search field: {field}"
@@ -215,7 +470,7 @@ def list_distinct(c, field, query=()):
     params = []
     for key, value in query:
         if key == "any":
-            terms.append("? IN ({})".format(",".join(_SEARCH_FIELDS)))
+            terms.append(_ANY_VALUE_FILTER)
         elif key in _SEARCH_FIELDS:
             terms.append(f"{key} = ?")
         else:
@@ -224,11 +479,28 @@ def list_distinct(c, field, query=()):
         params.append(value)
     if terms:
         sql += " AND " + " AND ".join(terms)
+    sql += " ORDER BY field"
     logger.debug("SQLite list query %r: %s", params, sql)
     return list(map(operator.itemgetter(0), c.execute(sql, params)))
 
 
 def dates(c, format="%Y-%m-%d"):  # noqa: A002
+    # years and months are listed from their indexes, without sorting
+    if format == "%Y":
+        rows = c.execute(
+            "SELECT DISTINCT year FROM track WHERE year IS NOT NULL ORDER BY year"
+        )
+        return [f"{year:04d}" for (year,) in rows]
+    if format == "%Y-%m":
+        rows = c.execute(
+            """
+        SELECT DISTINCT year_month
+          FROM track
+         WHERE year_month IS NOT NULL
+         ORDER BY year_month
+        """
+        )
+        return [f"{value // 100:04d}-{value % 100:02d}" for (value,) in rows]
     return list(
         map(
             operator.itemgetter(0),
@@ -254,14 +526,43 @@ def exists(c, uri):
     return rows.fetchone()[0]
 
 
-def browse(c, type=None, order=("type", "name COLLATE NOCASE"), **kwargs):  # noqa: A002
+def browse(c, type=None, order=("type", "sortkey", "uri"), **kwargs):  # noqa: A002
     filters, params = _filters(_BROWSE_FILTERS[type], **kwargs)
     sql = _BROWSE_QUERIES[type] % (
         " AND ".join(filters) or "1",
         ", ".join(order),
     )
     logger.debug("SQLite browse query %r: %s", params, sql)
-    return [Ref(**row) for row in c.execute(sql, params)]
+    rows = c.execute(sql, params)
+    return [Ref(type=row.type, uri=row.uri, name=row.name) for row in rows]
+
+
+def iter_browse(c, type, key="name_key", after=None, **kwargs):  # noqa: A002
+    """Yield `(sortkey, ref)` pairs of albums, artists or tracks.
+
+    Results are ordered by the sort key column `key`, then by URI, and read
+    from the database as the generator is consumed. To continue after a
+    previous result, pass its sort key and URI as `after`.
+    """
+    table = _BROWSE_TABLES[type]
+    filters, params = _filters(_BROWSE_FILTERS[type], **kwargs)
+    if after is not None:
+        filters.append(f"({key}, {table}.uri) > (?, ?)")
+        params.extend(after)
+    sql = f"""
+    SELECT uri AS uri, name AS name, {key} AS sortkey
+      FROM {table}
+     WHERE {" AND ".join(filters) or "1"}
+     ORDER BY {key}, uri
+    """  # noqa: S608
+    logger.debug("SQLite browse query %r: %s", params, sql)
+    cursor = c.execute(sql, params)
+    try:
+        for row in cursor:
+            yield row.sortkey, Ref(type=type, uri=row.uri, name=row.name)
+    finally:
+        # don't keep a read transaction open if not read to the end
+        cursor.close()
 
 
 def search_tracks(c, query, limit, offset, exact, filters=()):  # noqa: PLR0913, PLR0917
@@ -281,6 +582,9 @@ def search_tracks(c, query, limit, offset, exact, filters=()):  # noqa: PLR0913,
             logger.debug("Skipped SQLite search filter %r", kwargs)
     if clauses:
         sql += " AND ({})".format(" OR ".join(clauses))
+    if query and not exact:
+        # best matches first, so the limit doesn't cut off arbitrary ones
+        sql += " ORDER BY hits.rank"
     sql += " LIMIT ? OFFSET ?"
     params += [limit, offset]
     logger.debug("SQLite search query %r: %s", params, sql)
@@ -307,78 +611,189 @@ def get_track_images(c, uri):
     return images
 
 
-def insert_artists(c, artists):
-    if not artists:
-        return None
-    if len(artists) != 1:
-        logger.warning("Ignoring multiple artists: %r", artists)
-    artist = next(iter(artists))
-    _insert(
-        c,
-        "artist",
-        {
-            "uri": artist.uri,
-            "name": artist.name,
-            "sortname": artist.sortname,
-            "musicbrainz_id": (
-                str(artist.musicbrainz_id) if artist.musicbrainz_id else None
-            ),
-        },
+def insert_track(c, track, images=None, articles=()):
+    insert_tracks(c, [(track, images)], articles=articles)
+    return track.uri
+
+
+def insert_tracks(c, tracks, written=None, articles=()):
+    """Insert or replace tracks, given as ``(track, images)`` pairs.
+
+    The artists and albums of all tracks are collected first, so each of them
+    is written only once, and every table is then written with a single
+    ``executemany()``. If any of the tracks can't be inserted, none are.
+
+    Rows are only updated if they changed, so that rescanning unchanged
+    tracks doesn't touch the full-text index. Since the index also holds
+    artist and album names, all tracks are replaced if any of their artists
+    or albums changed. If ``written`` is given, it is a set of artist and
+    album rows known to be in the database already, which are skipped, and
+    is updated with the rows written.
+
+    Sort keys are computed ignoring any of ``articles``, see `sort_key()`.
+    """
+    key = _sort_key_func(articles)
+    artists, albums, rows = {}, {}, {}
+    for track, images in tracks:
+        rows[track.uri] = (
+            track.uri,
+            track.name,
+            _album_uri(artists, albums, track.album, images, key),
+            _artist_uri(artists, track.artists, key),
+            _artist_uri(artists, track.composers, key),
+            _artist_uri(artists, track.performers, key),
+            track.genre,
+            track.track_no,
+            track.disc_no,
+            track.date,
+            track.length,
+            track.bitrate,
+            track.comment,
+            str(track.musicbrainz_id) if track.musicbrainz_id else None,
+            track.last_modified,
+            key(track.name),
+            *_date_numbers(track.date),
+        )
+    if written is None:
+        written = set()
+    artists = [row for row in artists.values() if row not in written]
+    albums = [row for row in albums.values() if row not in written]
+    logger.debug(
+        "Inserting %d artists, %d albums and %d tracks",
+        len(artists),
+        len(albums),
+        len(rows),
     )
-    return artist.uri
+    # referenced rows first, in case foreign keys are enforced
+    with _savepoint(c, "insert_tracks"):
+        changes = c.total_changes
+        c.executemany(_UPSERT_ARTIST_SQL, artists)
+        c.executemany(_UPSERT_ALBUM_SQL, albums)
+        if c.total_changes == changes:
+            c.executemany(_UPSERT_TRACK_SQL, rows.values())
+        else:
+            c.executemany(_UPDATE_TRACK_SQL, rows.values())
+    written.update(artists, albums)
+    return len(rows)
 
 
-def insert_album(c, album, images=None):
-    if not album or not album.name:
-        return None
-    _insert(
-        c,
-        "album",
-        {
-            "uri": album.uri,
-            "name": album.name,
-            "artists": insert_artists(c, album.artists),
-            "num_tracks": album.num_tracks,
-            "num_discs": album.num_discs,
-            "date": album.date,
-            "musicbrainz_id": (
-                str(album.musicbrainz_id) if album.musicbrainz_id else None
-            ),
-            "images": " ".join(images) if images else None,
-        },
+def track_uris(c, prefix=""):
+    # Range scan on the primary key rather than a LIKE pattern
+    rows = c.execute(
+        "SELECT uri FROM track WHERE uri >= ? AND uri < ?",
+        (prefix, prefix + "\U0010ffff"),
     )
-    return album.uri
+    return [row.uri for row in rows]
+
+
+def delete_track(c, uri):
+    c.execute("DELETE FROM track WHERE uri = ?", (uri,))
+
+
+def delete_tracks(c, uris):
+    """Delete many tracks at once, returning the number of deleted tracks.
+
+    Rather than having triggers delete each track from the search tables and
+    full-text index in turn, the triggers are dropped while all of the tracks
+    are deleted from each table with one statement.
+    """
+    c.execute("CREATE TEMP TABLE IF NOT EXISTS deleted_track (uri TEXT PRIMARY KEY)")
+    docids = "SELECT track.rowid FROM track JOIN temp.deleted_track USING (uri)"
+    with (
+        _savepoint(c, "delete_tracks"),
+        _triggers_dropped(c, "track_after_delete", "search_after_delete"),
+    ):
+        c.executemany(
+            "INSERT OR IGNORE INTO temp.deleted_track (uri) VALUES (?)",
+            ((uri,) for uri in uris),
+        )
+        c.execute(_DELETE_FROM_FTS_SQL % docids)
+        c.execute(
+            f"""
+        DELETE FROM search_value WHERE (value, docid) IN (
+            SELECT value, docid FROM search_value_source WHERE docid IN ({docids})
+        )
+        """,  # noqa: S608
+        )
+        c.execute(f"DELETE FROM search WHERE docid IN ({docids})")  # noqa: S608
+        rows = c.execute(
+            "DELETE FROM track WHERE uri IN (SELECT uri FROM temp.deleted_track)",
+        )
+        c.execute("DELETE FROM temp.deleted_track")
+    return rows.rowcount
+
+
+@contextlib.contextmanager
+def fulltext_index_deferred(c):
+    """Leave the search tables and full-text index out of date within the block.
+
+    Within the block, the triggers maintaining them are dropped, so tracks,
+    albums and artists can be added, updated and deleted without touching
+    either. The block must be left before committing, which creates the
+    triggers again. Until `rebuild_fulltext_index()` is called, a pending
+    rebuild is recorded in the database, so an interrupted bulk load is
+    completed by the next `load()`.
+    """
+    with (
+        _savepoint(c, "fulltext_index_deferred"),
+        _triggers_dropped(c, *_SEARCH_TRIGGERS),
+    ):
+        c.execute("INSERT OR IGNORE INTO search_rebuild_pending (id) VALUES (1)")
+        yield
+
+
+def rebuild_fulltext_index(c):
+    c.execute("DELETE FROM search")
+    c.execute("INSERT INTO search SELECT * FROM search_source")
+    c.execute("INSERT INTO fts (fts) VALUES ('rebuild')")
+    c.execute("DELETE FROM search_value")
+    c.execute(
+        """
+    INSERT INTO search_value (value, docid)
+    SELECT DISTINCT value, docid FROM search_value_source
+    """,
+    )
+    c.execute("DELETE FROM search_rebuild_pending")
+
 
+def fulltext_rebuild_pending(c):
+    rows = c.execute("SELECT EXISTS (SELECT * FROM search_rebuild_pending)")
+    return bool(rows.fetchone()[0])
 
-def insert_track(c, track, images=None):
+
+def scan_failures(c):
+    rows = c.execute("SELECT uri, last_modified FROM scan_failures")
+    return dict(rows.fetchall())
+
+
+def insert_scan_failure(c, uri, last_modified, reason=None):
     _insert(
         c,
-        "track",
-        {
-            "uri": track.uri,
-            "name": track.name,
-            "album": insert_album(c, track.album, images),
-            "artists": insert_artists(c, track.artists),
-            "composers": insert_artists(c, track.composers),
-            "performers": insert_artists(c, track.performers),
-            "genre": track.genre,
-            "track_no": track.track_no,
-            "disc_no": track.disc_no,
-            "date": track.date,
-            "length": track.length,
-            "bitrate": track.bitrate,
-            "comment": track.comment,
-            "musicbrainz_id": (
-                str(track.musicbrainz_id) if track.musicbrainz_id else None
-            ),
-            "last_modified": track.last_modified,
-        },
+        "scan_failures",
+        {"uri": uri, "last_modified": last_modified, "reason": reason},
     )
-    return track.uri
 
 
-def delete_track(c, uri):
-    c.execute("DELETE FROM track WHERE uri = ?", (uri,))
+def delete_scan_failure(c, uri):
+    c.execute("DELETE FROM scan_failures WHERE uri = ?", (uri,))
+
+
+def scan_directories(c, scan_filter=None):
+    row = c.execute("SELECT settings FROM scan_filter").fetchone()
+    if (row[0] if row else None) != scan_filter:
+        return {}
+    rows = c.execute("SELECT uri, last_modified FROM scan_directories")
+    return dict(rows.fetchall())
+
+
+def replace_scan_directories(c, dir_mtimes, scan_filter=None):
+    c.execute("DELETE FROM scan_directories")
+    c.executemany(
+        "INSERT INTO scan_directories (uri, last_modified) VALUES (?, ?)",
+        dir_mtimes.items(),
+    )
+    c.execute("DELETE FROM scan_filter")
+    c.execute("INSERT INTO scan_filter (settings) VALUES (?)", (scan_filter,))
 
 
 def count_tracks(c):
@@ -393,20 +808,88 @@ def cleanup(c):
     )
     """,
     )
+    # Not correlated, so the referenced artists are only looked up once; with
+    # mostly NULL composers and performers, SQLite's statistics would make a
+    # correlated subquery scan all tracks for each artist.
+    c.execute(
+        """
+    DELETE FROM artist WHERE uri NOT IN (
+        SELECT artists FROM track WHERE artists IS NOT NULL
+         UNION ALL
+        SELECT composers FROM track WHERE composers IS NOT NULL
+         UNION ALL
+        SELECT performers FROM track WHERE performers IS NOT NULL
+         UNION ALL
+        SELECT artists FROM album WHERE artists IS NOT NULL
+    )
+    """,
+    )
     c.execute(
         """
-    DELETE FROM artist WHERE NOT EXISTS (
+    DELETE FROM scan_failures WHERE EXISTS (
+        SELECT uri FROM track WHERE track.uri = scan_failures.uri
+    )
+    """,
+    )
+    c.execute("ANALYZE")
+
+
+def track_references(c, uris):
+    """Return the URIs of the albums and artists referenced by tracks."""
+    albums, artists = set(), set()
+    for uri in uris:
+        row = c.execute(
+            """
+        SELECT track.album, track.artists, track.composers, track.performers,
+               album.artists
+          FROM track LEFT OUTER JOIN album ON track.album = album.uri
+         WHERE track.uri = ?
+        """,
+            (uri,),
+        ).fetchone()
+        if row:
+            albums.add(row[0])
+            artists.update(row[1:])
+    albums.discard(None)
+    artists.discard(None)
+    return albums, artists
+
+
+def cleanup_tracks(c, uris, albums, artists):
+    """Like :func:`cleanup`, but only for the given tracks, albums and artists.
+
+    Deletes the scan failures of tracks which have been added since, and the
+    albums and artists which are no longer referenced, e.g. those returned by
+    :func:`track_references` before the tracks were changed.
+    """
+    c.executemany(
+        """
+    DELETE FROM scan_failures WHERE uri = ? AND EXISTS (
+        SELECT uri FROM track WHERE track.uri = scan_failures.uri
+    )
+    """,
+        ((uri,) for uri in uris),
+    )
+    c.executemany(
+        """
+    DELETE FROM album WHERE uri = ? AND NOT EXISTS (
+        SELECT uri FROM track WHERE track.album = album.uri
+    )
+    """,
+        ((uri,) for uri in albums),
+    )
+    c.executemany(
+        """
+    DELETE FROM artist WHERE uri = ? AND NOT EXISTS (
         SELECT uri FROM track WHERE track.artists = artist.uri
-         UNION
-        SELECT uri FROM track WHERE track.composers = artist.uri
-         UNION
-        SELECT uri FROM track WHERE track.performers = artist.uri
-         UNION
+                                 OR track.composers = artist.uri
+                                 OR track.performers = artist.uri
+    ) AND NOT EXISTS (
         SELECT uri FROM album WHERE album.artists = artist.uri
     )
     """,
+        ((uri,) for uri in artists),
     )
-    c.execute("ANALYZE")
 
 
 def clear(c):
@@ -415,11 +898,111 @@ def clear(c):
     DELETE FROM track;
     DELETE FROM album;
     DELETE FROM artist;
+    DELETE FROM scan_failures;
+    DELETE FROM scan_directories;
+    DELETE FROM scan_filter;
     VACUUM;
     """,
     )
 
 
+@contextlib.contextmanager
+def _savepoint(c, name):
+    c.execute(f"SAVEPOINT {name}")
+    try:
+        yield
+    except BaseException:
+        c.execute(f"ROLLBACK TO {name}")
+        c.execute(f"RELEASE {name}")
+        raise
+    c.execute(f"RELEASE {name}")
+
+
+@contextlib.contextmanager
+def _triggers_dropped(c, *names):
+    """Drop triggers, and create them again when leaving the block.
+
+    To hide the missing triggers from other connections, this should be used
+    within a transaction.
+    """
+    rows = c.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger'")
+    statements = [row.sql for row in rows if row.name in names]
+    for name in names:
+        c.execute(f"DROP TRIGGER IF EXISTS {name}")
+    try:
+        yield
+    finally:
+        for sql in statements:
+            c.execute(sql)
+
+
+def _artist_uri(artists, models, key):
+    if not models:
+        return None
+    if len(models) != 1:
+        logger.warning("Ignoring multiple artists: %r", models)
+    artist = next(iter(models))
+    artists[artist.uri] = (
+        artist.uri,
+        artist.name,
+        artist.sortname,
+        str(artist.musicbrainz_id) if artist.musicbrainz_id else None,
+        key(artist.name),
+        key(artist.sortname or artist.name),
+    )
+    return artist.uri
+
+
+def _album_uri(artists, albums, album, images, key):
+    if not album or not album.name:
+        return None
+    albums[album.uri] = (
+        album.uri,
+        album.name,
+        _artist_uri(artists, album.artists, key),
+        album.num_tracks,
+        album.num_discs,
+        album.date,
+        str(album.musicbrainz_id) if album.musicbrainz_id else None,
+        " ".join(images) if images else None,
+        key(album.name),
+    )
+    return album.uri
+
+
+def _date_numbers(date):
+    """Return the release year and year-month of a date as numbers.
+
+    Dates without a month have no year-month, e.g. "2015" gives
+    ``(2015, None)``, so they are not matched by a month.
+    """
+    match = _DATE_RE.fullmatch(date) if date else None
+    if not match:
+        return (None, None)
+    year = int(match[1])
+    return (year, year * 100 + int(match[2]) if match[2] else None)
+
+
+def _date_filter(value):
+    # years and months match the indexed numbers, anything else is a prefix
+    match = _DATE_RE.fullmatch(value)
+    if match and match[2] is None:
+        return ("year", int(match[1]))
+    if match and match.end(2) == len(value):
+        return ("year_month", int(match[1]) * 100 + int(match[2]))
+    return ("date", value)
+
+
+def _max_age_cutoff(max_age):
+    # computed once rather than per row, in milliseconds like last_modified
+    return (int(time.time()) - int(float(max_age))) * 1000
+
+
+def _sort_key_func(articles):
+    articles = frozenset(map(sort_key, articles))
+    return lambda name: sort_key(name, articles) if name is not None else None
+
+
 def _insert(c, table, params):
     sql = "INSERT OR REPLACE INTO {} ({}) VALUES ({})".format(  # noqa: S608
         table,
@@ -439,6 +1022,17 @@ def _filters(mapping, role=None, **kwargs):
         else:
             filters.append(" OR ".join(rolemap[r] for r in role))
     for key, value in kwargs.items():
+        if key == "date" and "year" in mapping:
+            key, value = _date_filter(value)  # noqa: PLW2901
+        elif key == "max-age":
+            try:
+                value = _max_age_cutoff(value)  # noqa: PLW2901
+            except (OverflowError, ValueError):
+                # nothing is recent enough for an invalid maximum age
+                logger.debug("Invalid SQLite filter: %s=%r", key, value)
+                if key in mapping:
+                    filters.append("0")
+                continue
         if key in mapping:
             filters.append(mapping[key])
             params.append(value)
@@ -452,7 +1046,7 @@ def _indexed_query(query):
     params = []
     for field, value in query:
         if field == "any":
-            terms.append("? IN ({})".format(",".join(_SEARCH_FIELDS)))
+            terms.append(_ANY_VALUE_FILTER)
         elif field in _SEARCH_FIELDS:
             terms.append(f"{field} = ?")
         else:
@@ -464,17 +1058,19 @@ def _indexed_query(query):
 
 def _fulltext_query(query):
     terms = []
-    params = []
     for field, value in query:
-        if field == "any":
-            terms.append(_SEARCH_SQL % ("fts", "fts MATCH ?"))
-        elif field in _SEARCH_FIELDS:
-            terms.append(_SEARCH_SQL % ("fts", f"{field} MATCH ?"))
-        else:
+        if field != "any" and field not in _SEARCH_FIELDS:
             msg = f"Invalid search field: {field}"
             raise LookupError(msg)
-        params.append(value)
-    return (" INTERSECT ".join(terms), params)
+        # Match words by prefix, quoted so they are never taken as operators;
+        # an empty phrase matches nothing
+        words = [word.replace('"', '""') for word in str(value).split()]
+        phrases = " ".join(f'"{word}"*' for word in words) or '""'
+        if field == "any":
+            terms.append(f"({phrases})")
+        else:
+            terms.append(f"{field} : ({phrases})")
+    return (_FULLTEXT_SEARCH_SQL, [" AND ".join(terms)])
 
 
 def _tracks(rows):
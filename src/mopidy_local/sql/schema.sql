@@ -2,13 +2,15 @@
 
 BEGIN EXCLUSIVE TRANSACTION;
 
-PRAGMA user_version = 7;                -- schema version
+PRAGMA user_version = 19;               -- schema version
 
 CREATE TABLE artist (
     uri             TEXT PRIMARY KEY,   -- artist URI
     name            TEXT NOT NULL,      -- artist name
     sortname        TEXT,               -- artist name for sorting
-    musicbrainz_id  TEXT                -- MusicBrainz ID
+    musicbrainz_id  TEXT,               -- MusicBrainz ID
+    name_key        TEXT,               -- sort key of name
+    sortname_key    TEXT                -- sort key of sortname, or of name
 );
 
 CREATE TABLE album (
@@ -20,6 +22,8 @@ CREATE TABLE album (
     date            TEXT,               -- album release date (YYYY or YYYY-MM-DD)
     musicbrainz_id  TEXT,               -- MusicBrainz ID
     images          TEXT,               -- (list of strings) album image URIs
+    name_key        TEXT,               -- sort key of name
+    last_modified   INTEGER,            -- most recent last_modified of tracks
     FOREIGN KEY (artists) REFERENCES artist (uri)
 );
 
@@ -39,15 +43,40 @@ CREATE TABLE track (
     comment         TEXT,               -- track comment
     musicbrainz_id  TEXT,               -- MusicBrainz ID
     last_modified   INTEGER,            -- Represents last modification time
+    name_key        TEXT,               -- sort key of name
+    year            INTEGER,            -- release year, e.g. 2015
+    year_month      INTEGER,            -- release year and month, e.g. 201503
     FOREIGN KEY (album) REFERENCES album (uri),
     FOREIGN KEY (artists) REFERENCES artist (uri),
     FOREIGN KEY (composers) REFERENCES artist (uri),
     FOREIGN KEY (performers) REFERENCES artist (uri)
 );
 
+CREATE TABLE scan_failures (
+    uri             TEXT PRIMARY KEY,   -- track URI
+    last_modified   INTEGER NOT NULL,   -- file modification time when scanned
+    reason          TEXT                -- why the file could not be added
+);
+
+CREATE TABLE scan_directories (
+    uri             TEXT PRIMARY KEY,   -- directory URI
+    last_modified   INTEGER NOT NULL    -- directory modification time
+);
+
+-- File filter settings the scan directories were recorded with
+CREATE TABLE scan_filter (
+    settings        TEXT                -- serialized filter settings
+);
+
+-- Holds a row while the search tables and full-text index are out of date
+CREATE TABLE search_rebuild_pending (
+    id              INTEGER PRIMARY KEY CHECK (id = 1)
+);
+
 CREATE INDEX album_name_index            ON album (name);
 CREATE INDEX album_artists_index         ON album (artists);
 CREATE INDEX album_date_index            ON album (date);
+CREATE INDEX album_last_modified_index   ON album (last_modified);
 CREATE INDEX artist_name_index           ON artist (name);
 CREATE INDEX track_name_index            ON track (name);
 CREATE INDEX track_album_index           ON track (album);
@@ -64,6 +93,14 @@ CREATE INDEX album_musicbrainz_id_index  ON album (musicbrainz_id);
 CREATE INDEX artist_musicbrainz_id_index ON artist (musicbrainz_id);
 CREATE INDEX track_musicbrainz_id_index  ON track (musicbrainz_id);
 
+-- Sort order of browse results, also used for paging
+CREATE INDEX album_name_key_index        ON album (name_key, uri, name);
+CREATE INDEX artist_name_key_index       ON artist (name_key, uri, name);
+CREATE INDEX artist_sortname_key_index   ON artist (sortname_key, uri, name);
+CREATE INDEX track_name_key_index        ON track (name_key, uri, name);
+CREATE INDEX track_year_index            ON track (year, album);
+CREATE INDEX track_year_month_index      ON track (year_month, album);
+
 -- Convenience views
 
 CREATE VIEW albums AS
@@ -126,7 +163,7 @@ SELECT track.rowid                      AS docid,
 
 -- Indexed search; column names match Mopidy query fields
 
-CREATE VIEW search AS
+CREATE VIEW search_source AS
 SELECT docid                            AS docid,
        uri                              AS uri,
        name                             AS track_name,
@@ -143,12 +180,87 @@ SELECT docid                            AS docid,
        musicbrainz_id                   AS musicbrainz_trackid,
        album_musicbrainz_id             AS musicbrainz_albumid,
        artist_musicbrainz_id            AS musicbrainz_artistid
+  FROM tracks;
 
- FROM tracks;
+-- Materialized search_source, kept up to date by triggers
+
+CREATE TABLE search (
+    docid                INTEGER PRIMARY KEY,  -- track rowid
+    uri                  TEXT,                 -- track URI
+    track_name           TEXT,                 -- track name
+    album                TEXT,                 -- album name
+    artist               TEXT,                 -- artist name
+    composer             TEXT,                 -- composer name
+    performer            TEXT,                 -- performer name
+    albumartist          TEXT,                 -- album artist name
+    genre                TEXT,                 -- track genre
+    track_no             INTEGER,              -- track number in album
+    disc_no              INTEGER,              -- disc number in album
+    date                 TEXT,                 -- track or album release date
+    comment              TEXT,                 -- track comment
+    musicbrainz_trackid  TEXT,                 -- track MusicBrainz ID
+    musicbrainz_albumid  TEXT,                 -- album MusicBrainz ID
+    musicbrainz_artistid TEXT                  -- artist MusicBrainz ID
+);
+
+CREATE INDEX search_uri_index                     ON search (uri);
+CREATE INDEX search_track_name_index              ON search (track_name);
+CREATE INDEX search_album_index                   ON search (album);
+CREATE INDEX search_artist_index                  ON search (artist);
+CREATE INDEX search_composer_index                ON search (composer);
+CREATE INDEX search_performer_index               ON search (performer);
+CREATE INDEX search_albumartist_index             ON search (albumartist);
+CREATE INDEX search_genre_index                   ON search (genre);
+CREATE INDEX search_track_no_index                ON search (track_no);
+CREATE INDEX search_disc_no_index                 ON search (disc_no);
+CREATE INDEX search_date_index                    ON search (date);
+CREATE INDEX search_comment_index                 ON search (comment);
+CREATE INDEX search_musicbrainz_trackid_index     ON search (musicbrainz_trackid);
+CREATE INDEX search_musicbrainz_albumid_index     ON search (musicbrainz_albumid);
+CREATE INDEX search_musicbrainz_artistid_index    ON search (musicbrainz_artistid);
+
+-- Search values of all fields, for exact searches of any field
+
+CREATE VIEW search_value_source AS
+SELECT uri                  AS value, docid FROM search WHERE uri IS NOT NULL
+ UNION ALL
+SELECT track_name           AS value, docid FROM search WHERE track_name IS NOT NULL
+ UNION ALL
+SELECT album                AS value, docid FROM search WHERE album IS NOT NULL
+ UNION ALL
+SELECT artist               AS value, docid FROM search WHERE artist IS NOT NULL
+ UNION ALL
+SELECT composer             AS value, docid FROM search WHERE composer IS NOT NULL
+ UNION ALL
+SELECT performer            AS value, docid FROM search WHERE performer IS NOT NULL
+ UNION ALL
+SELECT albumartist          AS value, docid FROM search WHERE albumartist IS NOT NULL
+ UNION ALL
+SELECT genre                AS value, docid FROM search WHERE genre IS NOT NULL
+ UNION ALL
+SELECT CAST(track_no AS TEXT) AS value, docid FROM search WHERE track_no IS NOT NULL
+ UNION ALL
+SELECT CAST(disc_no AS TEXT) AS value, docid FROM search WHERE disc_no IS NOT NULL
+ UNION ALL
+SELECT date                 AS value, docid FROM search WHERE date IS NOT NULL
+ UNION ALL
+SELECT comment              AS value, docid FROM search WHERE comment IS NOT NULL
+ UNION ALL
+SELECT musicbrainz_trackid  AS value, docid FROM search WHERE musicbrainz_trackid IS NOT NULL
+ UNION ALL
+SELECT musicbrainz_albumid  AS value, docid FROM search WHERE musicbrainz_albumid IS NOT NULL
+ UNION ALL
+SELECT musicbrainz_artistid AS value, docid FROM search WHERE musicbrainz_artistid IS NOT NULL;
+
+CREATE TABLE search_value (
+    value           TEXT NOT NULL,      -- search field value
+    docid           INTEGER NOT NULL,   -- track rowid
+    PRIMARY KEY (value, docid)
+) WITHOUT ROWID;
 
 -- Full-text search; column names match Mopidy query fields
 
-CREATE VIRTUAL TABLE fts USING fts3 (
+CREATE VIRTUAL TABLE fts USING fts5 (
     uri,
     track_name,
     album,
@@ -163,13 +275,17 @@ CREATE VIRTUAL TABLE fts USING fts3 (
     comment,
     musicbrainz_trackid,
     musicbrainz_albumid,
-    musicbrainz_artistid
+    musicbrainz_artistid,
+    content = 'search',
+    content_rowid = 'docid',
+    prefix = '2 3',
+    tokenize = 'unicode61 remove_diacritics 2'
 );
 
-CREATE TRIGGER track_after_insert AFTER INSERT ON track
+CREATE TRIGGER search_after_insert AFTER INSERT ON search
 BEGIN
     INSERT INTO fts (
-        docid,
+        rowid,
         uri,
         track_name,
         album,
@@ -185,13 +301,33 @@ BEGIN
         musicbrainz_trackid,
         musicbrainz_albumid,
         musicbrainz_artistid
-    ) SELECT * FROM search WHERE docid = new.rowid;
+    ) VALUES (
+        new.docid,
+        new.uri,
+        new.track_name,
+        new.album,
+        new.artist,
+        new.composer,
+        new.performer,
+        new.albumartist,
+        new.genre,
+        new.track_no,
+        new.disc_no,
+        new.date,
+        new.comment,
+        new.musicbrainz_trackid,
+        new.musicbrainz_albumid,
+        new.musicbrainz_artistid
+    );
+    INSERT INTO search_value (value, docid)
+    SELECT DISTINCT value, docid FROM search_value_source WHERE docid = new.docid;
 END;
 
-CREATE TRIGGER track_after_update AFTER UPDATE ON track
+CREATE TRIGGER search_after_delete AFTER DELETE ON search
 BEGIN
     INSERT INTO fts (
-        docid,
+        fts,
+        rowid,
         uri,
         track_name,
         album,
@@ -207,17 +343,130 @@ BEGIN
         musicbrainz_trackid,
         musicbrainz_albumid,
         musicbrainz_artistid
-    ) SELECT * FROM search WHERE docid = new.rowid;
+    ) VALUES (
+        'delete',
+        old.docid,
+        old.uri,
+        old.track_name,
+        old.album,
+        old.artist,
+        old.composer,
+        old.performer,
+        old.albumartist,
+        old.genre,
+        old.track_no,
+        old.disc_no,
+        old.date,
+        old.comment,
+        old.musicbrainz_trackid,
+        old.musicbrainz_albumid,
+        old.musicbrainz_artistid
+    );
+    DELETE FROM search_value WHERE docid = old.docid AND value IN (
+        old.uri,
+        old.track_name,
+        old.album,
+        old.artist,
+        old.composer,
+        old.performer,
+        old.albumartist,
+        old.genre,
+        old.track_no,
+        old.disc_no,
+        old.date,
+        old.comment,
+        old.musicbrainz_trackid,
+        old.musicbrainz_albumid,
+        old.musicbrainz_artistid
+    );
+END;
+
+CREATE TRIGGER track_after_insert AFTER INSERT ON track
+BEGIN
+    INSERT INTO search SELECT * FROM search_source WHERE docid = new.rowid;
+END;
+
+CREATE TRIGGER track_after_update AFTER UPDATE ON track
+BEGIN
+    DELETE FROM search WHERE docid = old.rowid;
+    INSERT INTO search SELECT * FROM search_source WHERE docid = new.rowid;
 END;
 
-CREATE TRIGGER track_before_update BEFORE UPDATE ON track
+CREATE TRIGGER track_after_delete AFTER DELETE ON track
+BEGIN
+    DELETE FROM search WHERE docid = old.rowid;
+END;
+
+CREATE TRIGGER album_after_update AFTER UPDATE OF
+    uri,
+    name,
+    artists,
+    num_tracks,
+    num_discs,
+    date,
+    musicbrainz_id,
+    images
+ON album
+BEGIN
+    DELETE FROM search WHERE docid IN (
+        SELECT rowid FROM track WHERE album = new.uri
+    );
+    INSERT INTO search SELECT * FROM search_source WHERE docid IN (
+        SELECT rowid FROM track WHERE album = new.uri
+    );
+END;
+
+CREATE TRIGGER artist_after_update AFTER UPDATE ON artist
+BEGIN
+    DELETE FROM search WHERE docid IN (
+        SELECT rowid FROM track WHERE artists = new.uri
+         UNION
+        SELECT rowid FROM track WHERE composers = new.uri
+         UNION
+        SELECT rowid FROM track WHERE performers = new.uri
+         UNION
+        SELECT track.rowid FROM track JOIN album ON track.album = album.uri
+         WHERE album.artists = new.uri
+    );
+    INSERT INTO search SELECT * FROM search_source WHERE docid IN (
+        SELECT rowid FROM track WHERE artists = new.uri
+         UNION
+        SELECT rowid FROM track WHERE composers = new.uri
+         UNION
+        SELECT rowid FROM track WHERE performers = new.uri
+         UNION
+        SELECT track.rowid FROM track JOIN album ON track.album = album.uri
+         WHERE album.artists = new.uri
+    );
+END;
+
+-- Keep album.last_modified up to date
+CREATE TRIGGER album_last_modified_after_insert AFTER INSERT ON track
+BEGIN
+    UPDATE album SET last_modified = new.last_modified
+     WHERE uri = new.album
+       AND (last_modified IS NULL OR last_modified < new.last_modified);
+END;
+
+CREATE TRIGGER album_last_modified_after_update AFTER UPDATE OF
+    album,
+    last_modified
+ON track
+WHEN (new.album, new.last_modified) IS NOT (old.album, old.last_modified)
 BEGIN
-    DELETE FROM fts WHERE docid = old.rowid;
+    UPDATE album SET last_modified = (
+        SELECT max(last_modified) FROM track WHERE album = album.uri
+    ) WHERE uri = old.album AND last_modified <= old.last_modified;
+    UPDATE album SET last_modified = new.last_modified
+     WHERE uri = new.album
+       AND (last_modified IS NULL OR last_modified < new.last_modified);
 END;
 
-CREATE TRIGGER track_before_delete BEFORE DELETE ON track
+CREATE TRIGGER album_last_modified_after_delete AFTER DELETE ON track
 BEGIN
-    DELETE FROM fts WHERE docid = old.rowid;
+    UPDATE album SET last_modified = (
+        SELECT max(last_modified) FROM track WHERE album = album.uri
+    ) WHERE uri = old.album AND last_modified <= old.last_modified;
 END;
 
 END TRANSACTION;
@@ -0,0 +1,230 @@
+-- Mopidy-Local-SQLite schema upgrade v10 -> v11
+
+BEGIN EXCLUSIVE TRANSACTION;
+
+DROP TRIGGER track_after_insert;
+DROP TRIGGER track_after_update;
+DROP TRIGGER track_before_update;
+DROP TRIGGER track_before_delete;
+
+DROP TABLE fts;
+
+DROP VIEW search;
+
+CREATE VIEW search_source AS
+SELECT docid                            AS docid,
+       uri                              AS uri,
+       name                             AS track_name,
+       album_name                       AS album,
+       artist_name                      AS artist,
+       composer_name                    AS composer,
+       performer_name                   AS performer,
+       albumartist_name                 AS albumartist,
+       genre                            AS genre,
+       track_no                         AS track_no,
+       disc_no                          AS disc_no,
+       coalesce(date, album_date)       AS date,
+       comment                          AS comment,
+       musicbrainz_id                   AS musicbrainz_trackid,
+       album_musicbrainz_id             AS musicbrainz_albumid,
+       artist_musicbrainz_id            AS musicbrainz_artistid
+  FROM tracks;
+
+-- Materialized search_source, kept up to date by triggers
+
+CREATE TABLE search (
+    docid                INTEGER PRIMARY KEY,  -- track rowid
+    uri                  TEXT,                 -- track URI
+    track_name           TEXT,                 -- track name
+    album                TEXT,                 -- album name
+    artist               TEXT,                 -- artist name
+    composer             TEXT,                 -- composer name
+    performer            TEXT,                 -- performer name
+    albumartist          TEXT,                 -- album artist name
+    genre                TEXT,                 -- track genre
+    track_no             INTEGER,              -- track number in album
+    disc_no              INTEGER,              -- disc number in album
+    date                 TEXT,                 -- track or album release date
+    comment              TEXT,                 -- track comment
+    musicbrainz_trackid  TEXT,                 -- track MusicBrainz ID
+    musicbrainz_albumid  TEXT,                 -- album MusicBrainz ID
+    musicbrainz_artistid TEXT                  -- artist MusicBrainz ID
+);
+
+CREATE INDEX search_uri_index                     ON search (uri);
+CREATE INDEX search_track_name_index              ON search (track_name);
+CREATE INDEX search_album_index                   ON search (album);
+CREATE INDEX search_artist_index                  ON search (artist);
+CREATE INDEX search_composer_index                ON search (composer);
+CREATE INDEX search_performer_index               ON search (performer);
+CREATE INDEX search_albumartist_index             ON search (albumartist);
+CREATE INDEX search_genre_index                   ON search (genre);
+CREATE INDEX search_track_no_index                ON search (track_no);
+CREATE INDEX search_disc_no_index                 ON search (disc_no);
+CREATE INDEX search_date_index                    ON search (date);
+CREATE INDEX search_comment_index                 ON search (comment);
+CREATE INDEX search_musicbrainz_trackid_index     ON search (musicbrainz_trackid);
+CREATE INDEX search_musicbrainz_albumid_index     ON search (musicbrainz_albumid);
+CREATE INDEX search_musicbrainz_artistid_index    ON search (musicbrainz_artistid);
+
+INSERT INTO search SELECT * FROM search_source;
+
+-- Full-text search; column names match Mopidy query fields
+
+CREATE VIRTUAL TABLE fts USING fts5 (
+    uri,
+    track_name,
+    album,
+    artist,
+    composer,
+    performer,
+    albumartist,
+    genre,
+    track_no,
+    disc_no,
+    date,
+    comment,
+    musicbrainz_trackid,
+    musicbrainz_albumid,
+    musicbrainz_artistid,
+    content = 'search',
+    content_rowid = 'docid',
+    prefix = '2 3',
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+
+INSERT INTO fts (fts) VALUES ('rebuild');
+
+CREATE TRIGGER search_after_insert AFTER INSERT ON search
+BEGIN
+    INSERT INTO fts (
+        rowid,
+        uri,
+        track_name,
+        album,
+        artist,
+        composer,
+        performer,
+        albumartist,
+        genre,
+        track_no,
+        disc_no,
+        date,
+        comment,
+        musicbrainz_trackid,
+        musicbrainz_albumid,
+        musicbrainz_artistid
+    ) VALUES (
+        new.docid,
+        new.uri,
+        new.track_name,
+        new.album,
+        new.artist,
+        new.composer,
+        new.performer,
+        new.albumartist,
+        new.genre,
+        new.track_no,
+        new.disc_no,
+        new.date,
+        new.comment,
+        new.musicbrainz_trackid,
+        new.musicbrainz_albumid,
+        new.musicbrainz_artistid
+    );
+END;
+
+CREATE TRIGGER search_after_delete AFTER DELETE ON search
+BEGIN
+    INSERT INTO fts (
+        fts,
+        rowid,
+        uri,
+        track_name,
+        album,
+        artist,
+        composer,
+        performer,
+        albumartist,
+        genre,
+        track_no,
+        disc_no,
+        date,
+        comment,
+        musicbrainz_trackid,
+        musicbrainz_albumid,
+        musicbrainz_artistid
+    ) VALUES (
+        'delete',
+        old.docid,
+        old.uri,
+        old.track_name,
+        old.album,
+        old.artist,
+        old.composer,
+        old.performer,
+        old.albumartist,
+        old.genre,
+        old.track_no,
+        old.disc_no,
+        old.date,
+        old.comment,
+        old.musicbrainz_trackid,
+        old.musicbrainz_albumid,
+        old.musicbrainz_artistid
+    );
+END;
+
+CREATE TRIGGER track_after_insert AFTER INSERT ON track
+BEGIN
+    INSERT INTO search SELECT * FROM search_source WHERE docid = new.rowid;
+END;
+
+CREATE TRIGGER track_after_update AFTER UPDATE ON track
+BEGIN
+    DELETE FROM search WHERE docid = old.rowid;
+    INSERT INTO search SELECT * FROM search_source WHERE docid = new.rowid;
+END;
+
+CREATE TRIGGER track_after_delete AFTER DELETE ON track
+BEGIN
+    DELETE FROM search WHERE docid = old.rowid;
+END;
+
+CREATE TRIGGER album_after_update AFTER UPDATE ON album
+BEGIN
+    DELETE FROM search WHERE docid IN (
+        SELECT rowid FROM track WHERE album = new.uri
+    );
+    INSERT INTO search SELECT * FROM search_source WHERE docid IN (
+        SELECT rowid FROM track WHERE album = new.uri
+    );
+END;
+
+CREATE TRIGGER artist_after_update AFTER UPDATE ON artist
+BEGIN
+    DELETE FROM search WHERE docid IN (
+        SELECT rowid FROM track WHERE artists = new.uri
+         UNION
+        SELECT rowid FROM track WHERE composers = new.uri
+         UNION
+        SELECT rowid FROM track WHERE performers = new.uri
+         UNION
+        SELECT track.rowid FROM track JOIN album ON track.album = album.uri
+         WHERE album.artists = new.uri
+    );
+    INSERT INTO search SELECT * FROM search_source WHERE docid IN (
+        SELECT rowid FROM track WHERE artists = new.uri
+         UNION
+        SELECT rowid FROM track WHERE composers = new.uri
+         UNION
+        SELECT rowid FROM track WHERE performers = new.uri
+         UNION
+        SELECT track.rowid FROM track JOIN album ON track.album = album.uri
+         WHERE album.artists = new.uri
+    );
+END;
+
+PRAGMA user_version = 11;  -- update schema version
+
+END TRANSACTION;
@@ -0,0 +1,149 @@
+-- Mopidy-Local-SQLite schema upgrade v11 -> v12
+
+BEGIN EXCLUSIVE TRANSACTION;
+
+DROP TRIGGER search_after_insert;
+DROP TRIGGER search_after_delete;
+
+CREATE VIEW search_value_source AS
+SELECT uri                  AS value, docid FROM search WHERE uri IS NOT NULL
+ UNION ALL
+SELECT track_name           AS value, docid FROM search WHERE track_name IS NOT NULL
+ UNION ALL
+SELECT album                AS value, docid FROM search WHERE album IS NOT NULL
+ UNION ALL
+SELECT artist               AS value, docid FROM search WHERE artist IS NOT NULL
+ UNION ALL
+SELECT composer             AS value, docid FROM search WHERE composer IS NOT NULL
+ UNION ALL
+SELECT performer            AS value, docid FROM search WHERE performer IS NOT NULL
+ UNION ALL
+SELECT albumartist          AS value, docid FROM search WHERE albumartist IS NOT NULL
+ UNION ALL
+SELECT genre                AS value, docid FROM search WHERE genre IS NOT NULL
+ UNION ALL
+SELECT CAST(track_no AS TEXT) AS value, docid FROM search WHERE track_no IS NOT NULL
+ UNION ALL
+SELECT CAST(disc_no AS TEXT) AS value, docid FROM search WHERE disc_no IS NOT NULL
+ UNION ALL
+SELECT date                 AS value, docid FROM search WHERE date IS NOT NULL
+ UNION ALL
+SELECT comment              AS value, docid FROM search WHERE comment IS NOT NULL
+ UNION ALL
+SELECT musicbrainz_trackid  AS value, docid FROM search WHERE musicbrainz_trackid IS NOT NULL
+ UNION ALL
+SELECT musicbrainz_albumid  AS value, docid FROM search WHERE musicbrainz_albumid IS NOT NULL
+ UNION ALL
+SELECT musicbrainz_artistid AS value, docid FROM search WHERE musicbrainz_artistid IS NOT NULL;
+
+CREATE TABLE search_value (
+    value           TEXT NOT NULL,      -- search field value
+    docid           INTEGER NOT NULL,   -- track rowid
+    PRIMARY KEY (value, docid)
+) WITHOUT ROWID;
+
+INSERT OR IGNORE INTO search_value (value, docid)
+SELECT value, docid FROM search_value_source;
+
+CREATE TRIGGER search_after_insert AFTER INSERT ON search
+BEGIN
+    INSERT INTO fts (
+        rowid,
+        uri,
+        track_name,
+        album,
+        artist,
+        composer,
+        performer,
+        albumartist,
+        genre,
+        track_no,
+        disc_no,
+        date,
+        comment,
+        musicbrainz_trackid,
+        musicbrainz_albumid,
+        musicbrainz_artistid
+    ) VALUES (
+        new.docid,
+        new.uri,
+        new.track_name,
+        new.album,
+        new.artist,
+        new.composer,
+        new.performer,
+        new.albumartist,
+        new.genre,
+        new.track_no,
+        new.disc_no,
+        new.date,
+        new.comment,
+        new.musicbrainz_trackid,
+        new.musicbrainz_albumid,
+        new.musicbrainz_artistid
+    );
+    INSERT OR IGNORE INTO search_value (value, docid)
+    SELECT value, docid FROM search_value_source WHERE docid = new.docid;
+END;
+
+CREATE TRIGGER search_after_delete AFTER DELETE ON search
+BEGIN
+    INSERT INTO fts (
+        fts,
+        rowid,
+        uri,
+        track_name,
+        album,
+        artist,
+        composer,
+        performer,
+        albumartist,
+        genre,
+        track_no,
+        disc_no,
+        date,
+        comment,
+        musicbrainz_trackid,
+        musicbrainz_albumid,
+        musicbrainz_artistid
+    ) VALUES (
+        'delete',
+        old.docid,
+        old.uri,
+        old.track_name,
+        old.album,
+        old.artist,
+        old.composer,
+        old.performer,
+        old.albumartist,
+        old.genre,
+        old.track_no,
+        old.disc_no,
+        old.date,
+        old.comment,
+        old.musicbrainz_trackid,
+        old.musicbrainz_albumid,
+        old.musicbrainz_artistid
+    );
+    DELETE FROM search_value WHERE docid = old.docid AND value IN (
+        old.uri,
+        old.track_name,
+        old.album,
+        old.artist,
+        old.composer,
+        old.performer,
+        old.albumartist,
+        old.genre,
+        old.track_no,
+        old.disc_no,
+        old.date,
+        old.comment,
+        old.musicbrainz_trackid,
+        old.musicbrainz_albumid,
+        old.musicbrainz_artistid
+    );
+END;
+
+PRAGMA user_version = 12;  -- update schema version
+
+END TRANSACTION;
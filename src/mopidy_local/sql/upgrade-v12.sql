@@ -0,0 +1,12 @@
+-- Mopidy-Local-SQLite schema upgrade v12 -> v13
+
+BEGIN EXCLUSIVE TRANSACTION;
+
+-- Sort keys of browse results, also used for paging
+CREATE INDEX album_name_nocase_index     ON album (name COLLATE NOCASE, uri);
+CREATE INDEX artist_name_nocase_index    ON artist (name COLLATE NOCASE, uri);
+CREATE INDEX track_name_nocase_index     ON track (name COLLATE NOCASE, uri);
+
+PRAGMA user_version = 13;  -- update schema version
+
+END TRANSACTION;
@@ -0,0 +1,22 @@
+-- Mopidy-Local-SQLite schema upgrade v13 -> v14
+
+BEGIN EXCLUSIVE TRANSACTION;
+
+-- Sort keys are computed by Mopidy-Local when the database is loaded
+ALTER TABLE artist ADD COLUMN name_key TEXT;
+ALTER TABLE artist ADD COLUMN sortname_key TEXT;
+ALTER TABLE album ADD COLUMN name_key TEXT;
+ALTER TABLE track ADD COLUMN name_key TEXT;
+
+DROP INDEX album_name_nocase_index;
+DROP INDEX artist_name_nocase_index;
+DROP INDEX track_name_nocase_index;
+
+CREATE INDEX album_name_key_index        ON album (name_key, uri, name);
+CREATE INDEX artist_name_key_index       ON artist (name_key, uri, name);
+CREATE INDEX artist_sortname_key_index   ON artist (sortname_key, uri, name);
+CREATE INDEX track_name_key_index        ON track (name_key, uri, name);
+
+PRAGMA user_version = 14;  -- update schema version
+
+END TRANSACTION;
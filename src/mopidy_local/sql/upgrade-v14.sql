@@ -0,0 +1,34 @@
+-- Mopidy-Local-SQLite schema upgrade v14 -> v15
+
+BEGIN EXCLUSIVE TRANSACTION;
+
+-- Release year and month as numbers, e.g. 2015 and 201503; dates without
+-- a month have no year_month
+ALTER TABLE track ADD COLUMN year INTEGER;
+ALTER TABLE track ADD COLUMN year_month INTEGER;
+
+-- The new columns are not part of the search table
+DROP TRIGGER track_after_update;
+
+UPDATE track
+   SET year = CAST(substr(date, 1, 4) AS INTEGER),
+       year_month = CASE WHEN length(date) >= 7 THEN
+                        CAST(substr(date, 1, 4) AS INTEGER) * 100
+                      + CAST(substr(date, 6, 2) AS INTEGER)
+                    END
+ WHERE date GLOB '[0-9][0-9][0-9][0-9]'
+    OR date GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]'
+    OR date GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]';
+
+CREATE TRIGGER track_after_update AFTER UPDATE ON track
+BEGIN
+    DELETE FROM search WHERE docid = old.rowid;
+    INSERT INTO search SELECT * FROM search_source WHERE docid = new.rowid;
+END;
+
+CREATE INDEX track_year_index            ON track (year, album);
+CREATE INDEX track_year_month_index      ON track (year_month, album);
+
+PRAGMA user_version = 15;  -- update schema version
+
+END TRANSACTION;
@@ -0,0 +1,66 @@
+-- Mopidy-Local-SQLite schema upgrade v15 -> v16
+
+BEGIN EXCLUSIVE TRANSACTION;
+
+-- Modification time of an album's most recent track
+ALTER TABLE album ADD COLUMN last_modified INTEGER;
+
+-- Not part of the search table, so leave that alone when it changes
+DROP TRIGGER album_after_update;
+
+UPDATE album SET last_modified = (
+    SELECT max(last_modified) FROM track WHERE album = album.uri
+);
+
+CREATE INDEX album_last_modified_index   ON album (last_modified);
+
+CREATE TRIGGER album_after_update AFTER UPDATE OF
+    uri,
+    name,
+    artists,
+    num_tracks,
+    num_discs,
+    date,
+    musicbrainz_id,
+    images
+ON album
+BEGIN
+    DELETE FROM search WHERE docid IN (
+        SELECT rowid FROM track WHERE album = new.uri
+    );
+    INSERT INTO search SELECT * FROM search_source WHERE docid IN (
+        SELECT rowid FROM track WHERE album = new.uri
+    );
+END;
+
+CREATE TRIGGER album_last_modified_after_insert AFTER INSERT ON track
+BEGIN
+    UPDATE album SET last_modified = new.last_modified
+     WHERE uri = new.album
+       AND (last_modified IS NULL OR last_modified < new.last_modified);
+END;
+
+CREATE TRIGGER album_last_modified_after_update AFTER UPDATE OF
+    album,
+    last_modified
+ON track
+WHEN (new.album, new.last_modified) IS NOT (old.album, old.last_modified)
+BEGIN
+    UPDATE album SET last_modified = (
+        SELECT max(last_modified) FROM track WHERE album = album.uri
+    ) WHERE uri = old.album AND last_modified <= old.last_modified;
+    UPDATE album SET last_modified = new.last_modified
+     WHERE uri = new.album
+       AND (last_modified IS NULL OR last_modified < new.last_modified);
+END;
+
+CREATE TRIGGER album_last_modified_after_delete AFTER DELETE ON track
+BEGIN
+    UPDATE album SET last_modified = (
+        SELECT max(last_modified) FROM track WHERE album = album.uri
+    ) WHERE uri = old.album AND last_modified <= old.last_modified;
+END;
+
+PRAGMA user_version = 16;  -- update schema version
+
+END TRANSACTION;
@@ -0,0 +1,12 @@
+-- Mopidy-Local-SQLite schema upgrade v16 -> v17
+
+BEGIN EXCLUSIVE TRANSACTION;
+
+-- Holds a row while the search tables and full-text index are out of date
+CREATE TABLE search_rebuild_pending (
+    id              INTEGER PRIMARY KEY CHECK (id = 1)
+);
+
+PRAGMA user_version = 17;  -- update schema version
+
+END TRANSACTION;
@@ -0,0 +1,53 @@
+-- Mopidy-Local-SQLite schema upgrade v17 -> v18
+
+BEGIN EXCLUSIVE TRANSACTION;
+
+-- Fields may share a value, e.g. artist and album artist, which must only be
+-- inserted once; INSERT OR IGNORE within the trigger is overridden by the
+-- conflict resolution of the statement firing it
+DROP TRIGGER search_after_insert;
+
+CREATE TRIGGER search_after_insert AFTER INSERT ON search
+BEGIN
+    INSERT INTO fts (
+        rowid,
+        uri,
+        track_name,
+        album,
+        artist,
+        composer,
+        performer,
+        albumartist,
+        genre,
+        track_no,
+        disc_no,
+        date,
+        comment,
+        musicbrainz_trackid,
+        musicbrainz_albumid,
+        musicbrainz_artistid
+    ) VALUES (
+        new.docid,
+        new.uri,
+        new.track_name,
+        new.album,
+        new.artist,
+        new.composer,
+        new.performer,
+        new.albumartist,
+        new.genre,
+        new.track_no,
+        new.disc_no,
+        new.date,
+        new.comment,
+        new.musicbrainz_trackid,
+        new.musicbrainz_albumid,
+        new.musicbrainz_artistid
+    );
+    INSERT INTO search_value (value, docid)
+    SELECT DISTINCT value, docid FROM search_value_source WHERE docid = new.docid;
+END;
+
+PRAGMA user_version = 18;  -- update schema version
+
+END TRANSACTION;
@@ -0,0 +1,12 @@
+-- Mopidy-Local-SQLite schema upgrade v18 -> v19
+
+BEGIN EXCLUSIVE TRANSACTION;
+
+-- File filter settings the scan directories were recorded with
+CREATE TABLE scan_filter (
+    settings        TEXT                -- serialized filter settings
+);
+
+PRAGMA user_version = 19;  -- update schema version
+
+END TRANSACTION;
@@ -0,0 +1,13 @@
+-- Mopidy-Local-SQLite schema upgrade v7 -> v8
+
+BEGIN EXCLUSIVE TRANSACTION;
+
+CREATE TABLE scan_failures (
+    uri             TEXT PRIMARY KEY,   -- track URI
+    last_modified   INTEGER NOT NULL,   -- file modification time when scanned
+    reason          TEXT                -- why the file could not be added
+);
+
+PRAGMA user_version = 8;  -- update schema version
+
+END TRANSACTION;
@@ -0,0 +1,12 @@
+-- Mopidy-Local-SQLite schema upgrade v8 -> v9
+
+BEGIN EXCLUSIVE TRANSACTION;
+
+CREATE TABLE scan_directories (
+    uri             TEXT PRIMARY KEY,   -- directory URI
+    last_modified   INTEGER NOT NULL    -- directory modification time
+);
+
+PRAGMA user_version = 9;  -- update schema version
+
+END TRANSACTION;
@@ -0,0 +1,107 @@
+-- Mopidy-Local-SQLite schema upgrade v9 -> v10
+
+BEGIN EXCLUSIVE TRANSACTION;
+
+DROP TRIGGER track_after_insert;
+DROP TRIGGER track_after_update;
+DROP TRIGGER track_before_update;
+DROP TRIGGER track_before_delete;
+
+DROP TABLE fts;
+
+CREATE VIRTUAL TABLE fts USING fts5 (
+    uri,
+    track_name,
+    album,
+    artist,
+    composer,
+    performer,
+    albumartist,
+    genre,
+    track_no,
+    disc_no,
+    date,
+    comment,
+    musicbrainz_trackid,
+    musicbrainz_albumid,
+    musicbrainz_artistid,
+    prefix = '2 3',
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+
+INSERT INTO fts (
+    rowid,
+    uri,
+    track_name,
+    album,
+    artist,
+    composer,
+    performer,
+    albumartist,
+    genre,
+    track_no,
+    disc_no,
+    date,
+    comment,
+    musicbrainz_trackid,
+    musicbrainz_albumid,
+    musicbrainz_artistid
+) SELECT * FROM search;
+
+CREATE TRIGGER track_after_insert AFTER INSERT ON track
+BEGIN
+    INSERT INTO fts (
+        rowid,
+        uri,
+        track_name,
+        album,
+        artist,
+        composer,
+        performer,
+        albumartist,
+        genre,
+        track_no,
+        disc_no,
+        date,
+        comment,
+        musicbrainz_trackid,
+        musicbrainz_albumid,
+        musicbrainz_artistid
+    ) SELECT * FROM search WHERE docid = new.rowid;
+END;
+
+CREATE TRIGGER track_after_update AFTER UPDATE ON track
+BEGIN
+    INSERT INTO fts (
+        rowid,
+        uri,
+        track_name,
+        album,
+        artist,
+        composer,
+        performer,
+        albumartist,
+        genre,
+        track_no,
+        disc_no,
+        date,
+        comment,
+        musicbrainz_trackid,
+        musicbrainz_albumid,
+        musicbrainz_artistid
+    ) SELECT * FROM search WHERE docid = new.rowid;
+END;
+
+CREATE TRIGGER track_before_update BEFORE UPDATE ON track
+BEGIN
+    DELETE FROM fts WHERE rowid = old.rowid;
+END;
+
+CREATE TRIGGER track_before_delete BEFORE DELETE ON track
+BEGIN
+    DELETE FROM fts WHERE rowid = old.rowid;
+END;
+
+PRAGMA user_version = 10;  -- update schema version
+
+END TRANSACTION;
@@ -1,9 +1,11 @@
+import contextlib
 import hashlib
 import logging
 import pathlib
 import shutil
 import sqlite3
 import struct
+import time
 
 import uritools
 
@@ -58,6 +60,8 @@ def get_image_size_jpeg(data):
 
 MIN_BYTES_FOR_IMAGE_TYPE = 8
 
+DEFAULT_BATCH_SIZE = 1000
+
 
 def get_image_type_from_header(header: bytes) -> str:
     # original source: https://github.com/sphinx-doc/sphinx/commit/a502e7
@@ -89,16 +93,36 @@ class LocalStorageProvider:
         self._patterns = list(map(str, ext_config["album_art_files"]))
         self._dbpath = self._data_dir / "library.db"
         self._connection = None
+        self._batch_size = ext_config.get("scan_flush_threshold") or DEFAULT_BATCH_SIZE
+        self._pending = []
+        self._written = set()
+        self._bulk_load = None
+        self._articles = ext_config["sort_ignore_articles"] or ()
 
     def load(self):
         with self._connect() as connection:
             version = schema.load(connection)
             logger.debug("Using SQLite database schema v%s", version)
+            if count := schema.update_sort_keys(connection, self._articles):
+                logger.info("Updated sort keys of %d artists, albums and tracks", count)
             return schema.count_tracks(connection)
 
     def begin(self):
+        self._write_pending()
+        self._written.clear()
         return schema.tracks(self._connect())
 
+    def begin_bulk_load(self):
+        # Changes are still committed by flush(), but the full-text index is
+        # only rebuilt by close(), or by the next load() after a crash.
+        if self._bulk_load is None:
+            self._write_pending()
+            self._bulk_load = self._defer_fulltext_index()
+
+    def track_mtimes(self):
+        self._write_pending()
+        return schema.track_mtimes(self._connect())
+
     def add(self, track, tags=None, duration=None):  # noqa: ARG002
         logger.debug("Adding track: %s", track)
         images = None
@@ -111,23 +135,80 @@ class LocalStorageProvider:
                 logger.warning("Error extracting images for %s: %s", uri, e)
         try:
             track = self._validate_track(track)
-            schema.insert_track(self._connect(), track, images)
         except Exception as e:
             logger.warning("Skipped %s: %s", track.uri, e)
+        else:
+            self._pending.append((track, images))
+            if len(self._pending) >= self._batch_size:
+                self._write_pending()
 
     def remove(self, uri):
+        self._write_pending()
         schema.delete_track(self._connect(), uri)
 
+    def remove_tracks(self, uris):
+        self._write_pending()
+        start = time.monotonic()
+        count = schema.delete_tracks(self._connect(), uris)
+        logger.info("Removed %d tracks in %.3fs", count, time.monotonic() - start)
+        return count
+
+    def track_uris(self, prefix=""):
+        self._write_pending()
+        return schema.track_uris(self._connect(), prefix)
+
+    def track_references(self, uris):
+        self._write_pending()
+        return schema.track_references(self._connect(), uris)
+
+    def cleanup_tracks(self, uris, albums, artists):
+        # Unlike close(), leaves the rest of the library and images alone
+        self._write_pending()
+        schema.cleanup_tracks(self._connect(), uris, albums, artists)
+
+    def scan_failures(self):
+        return schema.scan_failures(self._connect())
+
+    def add_scan_failure(self, uri, last_modified, reason=None):
+        logger.debug("Adding scan failure: %s: %s", uri, reason)
+        schema.insert_scan_failure(self._connect(), uri, last_modified, reason)
+
+    def remove_scan_failure(self, uri):
+        schema.delete_scan_failure(self._connect(), uri)
+
+    def scan_directories(self, scan_filter=None):
+        return schema.scan_directories(self._connect(), scan_filter)
+
+    def set_scan_directories(self, dir_mtimes, scan_filter=None):
+        schema.replace_scan_directories(self._connect(), dir_mtimes, scan_filter)
+
     def flush(self):
+        self._write_pending()
         if not self._connection:
             return False
+        if self._bulk_load:
+            # Create the dropped triggers again, so they are never committed
+            self._bulk_load.close()
         self._connection.commit()
+        schema.checkpoint(self._connection)
+        if self._bulk_load:
+            self._bulk_load = self._defer_fulltext_index()
         return True
 
     def close(self):
+        self._write_pending()
+        self._written.clear()
+        if self._bulk_load:
+            self._bulk_load.close()
+            self._bulk_load = None
+            start = time.monotonic()
+            schema.rebuild_fulltext_index(self._connect())
+            logger.info("Rebuilt full-text index in %.3fs", time.monotonic() - start)
         if self._connection:
             schema.cleanup(self._connection)
             self._connection.commit()
+            # Leave no large write-ahead log behind after a scan
+            schema.checkpoint(self._connection, "TRUNCATE")
             self._connection.close()
             self._connection = None
         else:
@@ -135,6 +216,8 @@ class LocalStorageProvider:
         self._cleanup_images()
 
     def clear(self):
+        self._pending.clear()
+        self._written.clear()
         logger.info("Clearing image directory")
         try:
             shutil.rmtree(self._image_dir)
@@ -158,8 +241,32 @@ class LocalStorageProvider:
                 timeout=self._config["timeout"],
                 check_same_thread=False,
             )
+            schema.set_journal_mode(self._connection, self._config["journal_mode"])
         return self._connection
 
+    def _defer_fulltext_index(self):
+        stack = contextlib.ExitStack()
+        stack.enter_context(schema.fulltext_index_deferred(self._connect()))
+        return stack
+
+    def _write_pending(self):
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        connection = self._connect()
+        try:
+            schema.insert_tracks(connection, pending, self._written, self._articles)
+        except Exception as e:
+            # retry one by one, skipping the offending tracks
+            logger.debug("Error adding %d tracks: %s", len(pending), e)
+            for track, images in pending:
+                try:
+                    schema.insert_tracks(
+                        connection, [(track, images)], self._written, self._articles
+                    )
+                except Exception as e:
+                    logger.warning("Skipped %s: %s", track.uri, e)
+
     def _validate_artist(self, model):
         if not model.name:
             msg = "Empty artist name"
@@ -38,8 +38,17 @@ def path_to_file_uri(path: str | bytes | Path) -> Uri:
 
 def path_to_local_track_uri(path: str | bytes | Path, media_dir: Path) -> Uri:
     """Convert path to local track URI."""
+    return _path_to_local_uri("track", path, media_dir)
+
+
+def path_to_local_directory_uri(path: str | bytes | Path, media_dir: Path) -> Uri:
+    """Convert path to local directory URI."""
+    return _path_to_local_uri("directory", path, media_dir)
+
+
+def _path_to_local_uri(kind: str, path: str | bytes | Path, media_dir: Path) -> Uri:
     ppath = Path(os.fsdecode(path))
     if ppath.is_absolute():
         ppath = ppath.relative_to(media_dir)
     quoted_path = urllib.parse.quote(bytes(ppath))
-    return Uri(f"local:track:{quoted_path}")
+    return Uri(f"local:{kind}:{quoted_path}")
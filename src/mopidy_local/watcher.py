@@ -0,0 +1,197 @@
+import ctypes
+import ctypes.util
+import dataclasses
+import logging
+import os
+import pathlib
+import select
+import struct
+import time
+
+from mopidy import exceptions
+
+logger = logging.getLogger(__name__)
+
+# Event masks, see inotify(7)
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_ISDIR = 0x40000000
+
+_WATCH_MASK = (
+    IN_ATTRIB
+    | IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+    | IN_ONLYDIR
+)
+
+_EVENT = struct.Struct("iIII")  # wd, mask, cookie, len
+
+
+class WatchError(exceptions.MopidyException):
+    def __init__(self, message, errno=None):
+        super().__init__(message)
+        self.errno = errno
+
+
+@dataclasses.dataclass
+class Changes:
+    """Paths affected by a batch of filesystem events.
+
+    :param set modified: files or directories created or modified
+    :param set removed: files or directories deleted or moved away
+    :param bool overflowed: if events were lost, and the consumer should fall
+        back to a full scan
+    """
+
+    modified: set[pathlib.Path] = dataclasses.field(default_factory=set)
+    removed: set[pathlib.Path] = dataclasses.field(default_factory=set)
+    overflowed: bool = False
+
+    def __bool__(self):
+        return bool(self.modified or self.removed or self.overflowed)
+
+    def add(self, path, *, removed=False):
+        if removed:
+            self.modified.discard(path)
+            self.removed.add(path)
+        else:
+            self.removed.discard(path)
+            self.modified.add(path)
+
+
+class Watcher:
+    """Recursive watch of a directory tree using Linux inotify.
+
+    Watches are added for every directory below ``root``, and for directories
+    created or moved into the tree later on. Only directories are listed when
+    adding watches, files are never stat'ed.
+
+    :param Path root: root directory to watch
+    :param bool follow: if symlinks to directories should be followed
+    """
+
+    def __init__(self, root, *, follow=False):
+        self._root = pathlib.Path(root).resolve()
+        self._follow = follow
+        self._libc = _load_libc()
+        self._fd = self._libc.inotify_init1(os.O_CLOEXEC)
+        if self._fd < 0:
+            errno = ctypes.get_errno()
+            raise WatchError(os.strerror(errno), errno)
+        self._paths = {}  # watch descriptor -> directory path
+        self.add_tree(self._root)
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+            self._paths.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def add_tree(self, path):
+        """Watch ``path`` and all directories below it not watched yet."""
+        watched = set(self._paths.values())
+        for dir_path, dir_names, _ in os.walk(path, followlinks=self._follow):
+            dir_names[:] = [name for name in dir_names if not name.startswith(".")]
+            if (dir_path := pathlib.Path(dir_path)) not in watched:
+                self._add_watch(dir_path)
+
+    def changes(self, delay):
+        """Block until something changes, and return the affected paths.
+
+        Events are collected until none have arrived for ``delay`` seconds,
+        so that e.g. copying a whole album results in a single batch.
+
+        :param float delay: seconds of quiet before returning a batch
+        :rtype: :class:`Changes`
+        """
+        changes = Changes()
+        while not changes:
+            self._read(changes, timeout=None)
+        deadline = time.monotonic() + delay
+        while (timeout := deadline - time.monotonic()) > 0:
+            if self._read(changes, timeout=timeout):
+                deadline = time.monotonic() + delay
+        return changes
+
+    def _add_watch(self, path):
+        mask = _WATCH_MASK if self._follow else _WATCH_MASK | IN_DONT_FOLLOW
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), mask)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            logger.warning(f"Cannot watch {path.as_uri()}: {os.strerror(errno)}")
+        else:
+            self._paths[wd] = path
+
+    def _read(self, changes, timeout):
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return False
+        data = os.read(self._fd, 64 * 1024)
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = data[offset : offset + length].rstrip(b"\0")
+            offset += length
+            self._handle(changes, wd, mask, os.fsdecode(name))
+        return True
+
+    def _handle(self, changes, wd, mask, name):
+        if mask & IN_Q_OVERFLOW:
+            logger.warning("Too many filesystem events, some were lost")
+            # Directories created or moved in meanwhile are not watched yet
+            self.add_tree(self._root)
+            changes.overflowed = True
+            return
+        if mask & IN_IGNORED:
+            if self._paths.pop(wd, None) == self._root:
+                logger.warning(f"Watched directory {self._root.as_uri()} went away")
+            return
+        dir_path = self._paths.get(wd)
+        # Events without a name are about the watched directory itself
+        if dir_path is None or not name or name.startswith("."):
+            return
+        path = dir_path / name
+        if mask & (IN_DELETE | IN_MOVED_FROM):
+            if mask & IN_ISDIR:
+                self._remove_tree(path)
+            changes.add(path, removed=True)
+        elif mask & IN_ISDIR:
+            self.add_tree(path)
+            changes.add(path)
+        elif not mask & IN_CREATE:
+            # New files are picked up by IN_CLOSE_WRITE once fully written
+            changes.add(path)
+
+    def _remove_tree(self, path):
+        for wd, dir_path in list(self._paths.items()):
+            if dir_path == path or path in dir_path.parents:
+                self._libc.inotify_rm_watch(self._fd, wd)
+                del self._paths[wd]
+
+
+def _load_libc():
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        libc.inotify_init1  # noqa: B018
+    except (OSError, AttributeError) as exc:
+        msg = "inotify is not available on this platform"
+        raise WatchError(msg) from exc
+    return libc
@@ -0,0 +1,88 @@
+from mopidy_local import cache
+
+
+class Version:
+    def __init__(self):
+        self.value = 0
+
+    def __call__(self):
+        return self.value
+
+
+def test_get_caches_results():
+    c = cache.ResultCache(10, Version())
+    calls = []
+
+    def func(key):
+        calls.append(key)
+        return (key,)
+
+    assert c.get("a", func, "a") == ("a",)
+    assert c.get("a", func, "a") == ("a",)
+    assert c.get("b", func, "b") == ("b",)
+
+    assert calls == ["a", "b"]
+    assert c.info() == cache.CacheInfo(hits=1, misses=2, size=2, maxsize=10)
+
+
+def test_get_clears_cache_on_version_change():
+    version = Version()
+    c = cache.ResultCache(10, version)
+    c.get("a", tuple, "abc")
+
+    version.value += 1
+
+    assert c.get("a", tuple, "xyz") == ("x", "y", "z")
+    assert c.info() == cache.CacheInfo(hits=0, misses=2, size=3, maxsize=10)
+
+
+def test_get_skips_results_of_old_versions():
+    version = Version()
+    c = cache.ResultCache(10, version)
+
+    def func():
+        version.value += 1  # changed by a scan during the query
+        c.get("b", tuple, "b")
+        return ("a",)
+
+    assert c.get("a", func) == ("a",)
+    assert c.get("a", tuple, "new") == ("n", "e", "w")
+
+
+def test_get_evicts_least_recently_used():
+    c = cache.ResultCache(3, Version())
+    c.get("a", tuple, "aa")
+    c.get("b", tuple, "b")
+    c.get("a", tuple, "aa")
+
+    c.get("c", tuple, "c")
+
+    assert c.info().size == 3
+    c.get("a", tuple, "aa")
+    c.get("b", tuple, "b")  # evicted
+    assert c.info() == cache.CacheInfo(hits=2, misses=4, size=3, maxsize=3)
+
+
+def test_get_does_not_cache_large_results():
+    c = cache.ResultCache(2, Version())
+    c.get("a", tuple, "aaa")
+    c.get("a", tuple, "aaa")
+
+    assert c.info() == cache.CacheInfo(hits=0, misses=2, size=0, maxsize=2)
+
+
+def test_get_with_zero_maxsize_never_caches():
+    c = cache.ResultCache(0, Version())
+    c.get("a", tuple, "")
+    c.get("a", tuple, "")
+
+    assert c.info() == cache.CacheInfo(hits=0, misses=2, size=0, maxsize=0)
+
+
+def test_clear():
+    c = cache.ResultCache(10, Version())
+    c.get("a", tuple, "a")
+
+    c.clear()
+
+    assert c.info().size == 0
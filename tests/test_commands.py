@@ -0,0 +1,321 @@
+import os
+import pathlib
+import time
+
+import cyclopts
+import pytest
+from mopidy.models import Album, Artist, Track
+
+from mopidy_local import commands, mtimes, storage, translator, watcher
+
+
+@pytest.mark.parametrize("command", ["scan", "watch"])
+@pytest.mark.parametrize("jobs", ["0", "-1"])
+def test_jobs_must_be_positive(command, jobs):
+    with pytest.raises(cyclopts.ValidationError):
+        commands.app.parse_args(
+            [command, "--jobs", jobs], exit_on_error=False, print_error=False
+        )
+
+
+@pytest.mark.parametrize("command", ["scan", "watch"])
+def test_jobs(command):
+    _, bound, _ = commands.app.parse_args(
+        [command, "--jobs", "2"], exit_on_error=False, print_error=False
+    )
+
+    assert bound.kwargs["jobs"] == 2
+
+
+def fake_worker(connection, timeout):
+    connection.send(None)
+    while (path := connection.recv()) is not None:
+        if path.name == "crash":
+            os._exit(3)
+        if path.name == "hang":
+            time.sleep(60)
+        if path.name == "slow":
+            time.sleep(1)
+        connection.send((path.name, None))
+
+
+def broken_worker(connection, timeout):
+    os._exit(1)  # e.g. GStreamer failing to initialize
+
+
+@pytest.fixture
+def grace_period(monkeypatch):
+    monkeypatch.setattr(commands, "_SCAN_WORKER_GRACE_PERIOD", 2)
+
+
+def scan(files, *, workers=1, target=fake_worker):
+    paths = [pathlib.Path("/music", name) for name in files]
+    with commands._ScanPool(workers=workers, timeout=0, target=target) as pool:
+        results = list(pool.scan(paths))
+    return results, pool.failed
+
+
+def test_scan_pool(grace_period):
+    results, failed = scan(["a", "b", "c"], workers=2)
+
+    assert sorted(results) == [
+        (pathlib.Path("/music/a"), "a", None),
+        (pathlib.Path("/music/b"), "b", None),
+        (pathlib.Path("/music/c"), "c", None),
+    ]
+    assert failed == []
+
+
+def test_scan_pool_restarts_crashed_worker(grace_period):
+    results, failed = scan(["crash", "a"])
+
+    (path, result, error), second = results
+    assert path == pathlib.Path("/music/crash")
+    assert result is None
+    assert str(error) == "Scanner process died with exit code 3"
+    assert second == (pathlib.Path("/music/a"), "a", None)
+    assert failed == [pathlib.Path("/music/crash")]
+
+
+def test_scan_pool_restarts_hung_worker(grace_period):
+    results, failed = scan(["hang", "a"])
+
+    (path, result, error), second = results
+    assert path == pathlib.Path("/music/hang")
+    assert result is None
+    assert str(error) == "Scanner process stopped responding"
+    assert second == (pathlib.Path("/music/a"), "a", None)
+    assert failed == [pathlib.Path("/music/hang")]
+
+
+def test_scan_pool_yields_results_in_completion_order(grace_period):
+    results, _ = scan(["slow", "a"], workers=2)
+
+    assert [path.name for path, _, _ in results] == ["a", "slow"]
+
+
+def test_scan_pool_reports_failed_files(grace_period, caplog):
+    scan(["crash", "a", "hang"], workers=2)
+
+    assert "Skipped 2 files which crashed or hung the scanner" in caplog.text
+    assert "Crashed or hung the scanner: file:///music/crash" in caplog.text
+    assert "Crashed or hung the scanner: file:///music/hang" in caplog.text
+
+
+def test_scan_pool_aborts_if_worker_fails_to_start(grace_period):
+    with pytest.raises(commands.ScanWorkerError, match="failed to start"):
+        scan(["a", "b"], target=broken_worker)
+
+
+class KnownLibrary:
+    def __init__(self, media_dir, track_mtimes, scan_failures=None):
+        self._track_mtimes = {
+            translator.path_to_local_track_uri(path, media_dir): mtime
+            for path, mtime in track_mtimes.items()
+        }
+        self._scan_failures = scan_failures or {}
+
+    def track_mtimes(self):
+        return self._track_mtimes.items()
+
+    def scan_failures(self):
+        return self._scan_failures
+
+
+def test_find_known_files_stats_tracks_without_mtime(tmp_path):
+    valid, invalid = tmp_path / "valid.mp3", tmp_path / "invalid.mp3"
+    invalid.touch()
+    library = KnownLibrary(
+        tmp_path,
+        {valid: 1000, invalid: None, tmp_path / "missing.mp3": None},
+    )
+
+    known_files = commands._find_known_files(
+        media_dir=tmp_path,
+        dirs={tmp_path},
+        file_filter=mtimes.FileFilter(root=tmp_path),
+        library=library,
+    )
+
+    assert known_files == {
+        valid: 1000,
+        invalid: int(invalid.stat().st_mtime * 1000),
+    }
+
+
+@pytest.fixture
+def config(tmp_path, monkeypatch):
+    media_dir = tmp_path / "media"
+    media_dir.mkdir()
+    config = {
+        "core": {"data_dir": str(tmp_path)},
+        "local": {
+            "media_dir": str(media_dir),
+            "scan_timeout": 1000,
+            "scan_flush_threshold": 100,
+            "scan_follow_symlinks": False,
+            "scan_workers": 1,
+            "scan_walk_threads": 1,
+            "included_file_extensions": [],
+            "excluded_file_extensions": [],
+            "scan_include_patterns": [],
+            "scan_exclude_patterns": [],
+            "timeout": 10,
+            "journal_mode": "wal",
+            "sort_ignore_articles": [],
+            "album_art_files": [],
+        },
+    }
+    monkeypatch.setattr(commands.Config, "get_global", lambda: config)
+    return config
+
+
+@pytest.fixture
+def scanned(monkeypatch):
+    scanned = set()
+
+    def scan_metadata(*, files, **kwargs):
+        scanned.update(files)
+
+    monkeypatch.setattr(commands, "_scan_metadata", scan_metadata)
+    return scanned
+
+
+def media_files(config, *names):
+    paths = [pathlib.Path(config["local"]["media_dir"], name) for name in names]
+    for path in paths:
+        path.touch()
+    return paths
+
+
+def add_scan_failures(config, failures):
+    media_dir = pathlib.Path(config["local"]["media_dir"])
+    library = storage.LocalStorageProvider(config)
+    library.load()
+    for path, mtime in failures.items():
+        uri = translator.path_to_local_track_uri(path, media_dir)
+        library.add_scan_failure(uri, mtime)
+    library.close()
+
+
+def mtime(path):
+    return int(path.stat().st_mtime * 1000)
+
+
+def test_scan_skips_unchanged_failed_files(config, scanned):
+    failed, other = media_files(config, "failed.mp3", "other.mp3")
+    add_scan_failures(config, {failed: mtime(failed)})
+
+    assert commands.scan() == 0
+
+    assert scanned == {other}
+
+
+def test_scan_retries_modified_failed_files(config, scanned):
+    failed, other = media_files(config, "failed.mp3", "other.mp3")
+    add_scan_failures(config, {failed: mtime(failed) - 1000})
+
+    assert commands.scan() == 0
+
+    assert scanned == {failed, other}
+
+
+@pytest.mark.parametrize("option", ["retry_failed", "force_rescan"])
+def test_scan_retries_all_failed_files(config, scanned, option):
+    failed, other = media_files(config, "failed.mp3", "other.mp3")
+    add_scan_failures(config, {failed: mtime(failed)})
+
+    assert commands.scan(**{option: True}) == 0
+
+    assert scanned == {failed, other}
+
+
+def test_scan_forgets_failures_of_deleted_files(config, scanned):
+    (failed,) = media_files(config, "failed.mp3")
+    deleted = failed.with_name("deleted.mp3")
+    add_scan_failures(config, {failed: mtime(failed), deleted: 1000})
+
+    assert commands.scan() == 0
+
+    library = storage.LocalStorageProvider(config)
+    assert library.scan_failures() == {"local:track:failed.mp3": mtime(failed)}
+    library.close()
+    assert scanned == set()
+
+
+def test_incremental_scan_skips_unchanged_directories(config, scanned):
+    media_files(config, "song.mp3")
+    assert commands.scan() == 0
+    scanned.clear()
+
+    assert commands.scan(incremental=True) == 0
+
+    # Scanning is mocked, so the library knows no files in the directory
+    assert scanned == set()
+
+
+def test_incremental_scan_walks_all_directories_after_filter_change(config, scanned):
+    song, notes = media_files(config, "song.mp3", "notes.txt")
+    config["local"]["excluded_file_extensions"] = [".txt"]
+    assert commands.scan() == 0
+    assert scanned == {song}
+    scanned.clear()
+
+    config["local"]["excluded_file_extensions"] = []
+    assert commands.scan(incremental=True) == 0
+
+    assert scanned == {song, notes}
+
+
+def update_paths(config, *, modified=(), removed=()):
+    library = storage.LocalStorageProvider(config)
+    library.load()
+    commands._update_paths(
+        media_dir=pathlib.Path(config["local"]["media_dir"]),
+        changes=watcher.Changes(modified=set(modified), removed=set(removed)),
+        library=library,
+        config=config,
+        workers=1,
+    )
+    return library
+
+
+def test_update_paths_removes_tracks_below_removed_directory(config, scanned):
+    artist = Artist(uri="local:artist:0", name="artist")
+    album = Album(uri="local:album:0", name="album", artists=[artist])
+    library = storage.LocalStorageProvider(config)
+    library.load()
+    for uri in ["dir/a.mp3", "dir/sub/b.mp3", "dirx/c.mp3", "d.mp3"]:
+        track_album = album if uri.startswith("dir/") else None
+        library.add(Track(uri=f"local:track:{uri}", name=uri, album=track_album))
+    library.close()
+
+    media_dir = pathlib.Path(config["local"]["media_dir"])
+    library = update_paths(config, removed=[media_dir / "dir"])
+
+    assert sorted(library.track_uris()) == [
+        "local:track:d.mp3",
+        "local:track:dirx/c.mp3",
+    ]
+    c = library._connect()
+    assert c.execute("SELECT uri FROM album").fetchall() == []
+    assert c.execute("SELECT uri FROM artist").fetchall() == []
+    library.close()
+    assert scanned == set()
+
+
+def test_update_paths_rescans_modified_files(config, scanned):
+    (path,) = media_files(config, "a.mp3")
+
+    update_paths(config, modified=[path]).close()
+
+    assert scanned == {path}
+
+
+def test_update_paths_skips_unchanged_failed_files(config, scanned):
+    failed, modified = media_files(config, "failed.mp3", "modified.mp3")
+    add_scan_failures(config, {failed: mtime(failed), modified: mtime(modified) - 1})
+
+    update_paths(config, modified=[failed.parent]).close()
+
+    assert scanned == {modified}
@@ -23,11 +23,18 @@ def test_get_config_schema() -> None:
     assert "scan_timeout" in schema
     assert "scan_flush_threshold" in schema
     assert "scan_follow_symlinks" in schema
+    assert "scan_workers" in schema
+    assert "scan_walk_threads" in schema
     assert "included_file_extensions" in schema
     assert "excluded_file_extensions" in schema
+    assert "scan_include_patterns" in schema
+    assert "scan_exclude_patterns" in schema
     # from mopidy-local-sqlite
     assert "directories" in schema
     assert "timeout" in schema
+    assert "journal_mode" in schema
+    assert "cache_size" in schema
+    assert "sort_ignore_articles" in schema
     assert "use_artist_sortname" in schema
     # from mopidy-local-images
     assert "album_art_files" in schema
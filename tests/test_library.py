@@ -1,14 +1,16 @@
 import contextlib
 import pathlib
+import sqlite3
 import unittest
+from concurrent import futures
 from typing import cast
 from unittest import mock
 
 import pykka
 from mopidy import backend, core
-from mopidy.models import Album, SearchResult, Track
+from mopidy.models import Album, Artist, SearchResult, Track
 
-from mopidy_local import actor, storage, translator
+from mopidy_local import actor, library, storage, translator
 from tests import dummy_audio, path_to_data_dir
 
 
@@ -22,6 +24,9 @@ class LocalLibraryProviderTest(unittest.TestCase):
             "media_dir": path_to_data_dir(""),
             "directories": [],
             "timeout": 10,
+            "journal_mode": "wal",
+            "sort_ignore_articles": [],
+            "cache_size": 10000,
             "max_search_results": 100,
             "use_artist_sortname": False,
             "album_art_files": [],
@@ -110,3 +115,87 @@ class LocalLibraryProviderTest(unittest.TestCase):
 
         assert self.library.get_distinct("track").get() == set()
         distinct_mock.assert_called_once_with(mock.ANY, "track_name", [])
+
+    def test_pool_connections_are_read_only(self):
+        provider = library.LocalLibraryProvider(backend=None, config=self.config)
+        with provider._connect() as c, self.assertRaises(sqlite3.OperationalError):
+            c.execute("DELETE FROM track")
+        provider.close()
+
+    def test_pool_reuses_connections(self):
+        provider = library.LocalLibraryProvider(backend=None, config=self.config)
+        with provider._connect() as c1:
+            pass
+        with provider._connect() as c2:
+            assert c1 is c2
+        provider.close()
+
+    def test_concurrent_lookups(self):
+        tracks = [Track(uri=f"local:track:{i}", name=f"track #{i}") for i in range(32)]
+        self.storage.begin()
+        for track in tracks:
+            self.storage.add(track)
+        self.storage.close()
+        provider = library.LocalLibraryProvider(backend=None, config=self.config)
+
+        with futures.ThreadPoolExecutor(max_workers=16) as executor:
+            results = list(executor.map(provider.lookup, [t.uri for t in tracks]))
+
+        assert results == [[track] for track in tracks]
+        provider.close()
+
+    def test_cache_is_cleared_when_library_changes(self):
+        provider = library.LocalLibraryProvider(backend=None, config=self.config)
+        assert provider.get_distinct("track") == set()
+        assert provider.get_distinct("track") == set()
+
+        self.storage.begin()
+        self.storage.add(Track(uri="local:track:0", name="track #0"))
+        self.storage.close()
+
+        assert provider.get_distinct("track") == {"track #0"}
+        assert provider.cache_info() == (1, 2, 1, 10000)
+        provider.close()
+
+    def test_browse_by_max_age_is_not_cached(self):
+        self.storage.begin()
+        track = Track(uri="local:track:0", name="track #0", last_modified=1000000)
+        self.storage.add(track)
+        self.storage.close()
+        provider = library.LocalLibraryProvider(backend=None, config=self.config)
+        uri = "local:directory?type=track&max-age=100"
+
+        with mock.patch("time.time", return_value=1050):
+            assert [ref.uri for ref in provider.browse(uri)] == ["local:track:0"]
+        with mock.patch("time.time", return_value=1200):
+            assert provider.browse(uri) == []
+        provider.close()
+
+    def test_browse_artist_sorts_albums_ignoring_articles(self):
+        local_config = {**self.config["local"], "sort_ignore_articles": ["The"]}
+        config = {**self.config, "local": local_config}
+        artist = Artist(uri="local:artist:0", name="artist")
+        self.storage.begin()
+        for i, name in enumerate(["Beta", "The Alpha"]):
+            album = Album(uri=f"local:album:{i}", name=name, artists=[artist])
+            self.storage.add(Track(uri=f"local:track:{i}", name=name, album=album))
+        self.storage.close()
+        provider = library.LocalLibraryProvider(backend=None, config=config)
+
+        refs = provider.browse("local:artist:0")
+
+        assert [ref.name for ref in refs] == ["The Alpha", "Beta"]
+        provider.close()
+
+    def test_browse_directory_in_pages(self):
+        self.storage.begin()
+        for i in range(5):
+            self.storage.add(Track(uri=f"local:track:{i}", name=f"track #{i}"))
+        self.storage.close()
+
+        refs = self.library.browse("local:directory?type=track&limit=2").get()
+        assert [ref.name for ref in refs] == ["track #0", "track #1", "More"]
+        refs = self.library.browse(refs[-1].uri).get()
+        assert [ref.name for ref in refs] == ["track #2", "track #3", "More"]
+        refs = self.library.browse(refs[-1].uri).get()
+        assert [ref.name for ref in refs] == ["track #4"]
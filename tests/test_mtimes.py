@@ -1,3 +1,4 @@
+import logging
 import os
 import pathlib
 import shutil
@@ -218,3 +219,246 @@ def test_gives_mtime_in_milliseconds(tmp_dir_path):
 
     assert result == {file_path: 3141}
     assert errors == {}
+
+
+def test_find_changed_mtimes_without_known_dirs(tmp_dir_path):
+    file_path = tmp_dir_path / "dir" / "file"
+    file_path.parent.mkdir()
+    file_path.touch()
+
+    result, dirs, unchanged, errors = mtimes.find_changed_mtimes(tmp_dir_path, {})
+
+    assert result == {file_path: tests.IsA(int)}
+    assert dirs == {tmp_dir_path: tests.IsA(int), file_path.parent: tests.IsA(int)}
+    assert unchanged == set()
+    assert errors == {}
+
+
+def test_find_changed_mtimes_skips_files_in_unchanged_dirs(tmp_dir_path):
+    old_path = tmp_dir_path / "old" / "file"
+    old_path.parent.mkdir()
+    old_path.touch()
+    nested_path = tmp_dir_path / "old" / "nested" / "file"
+    nested_path.parent.mkdir()
+    nested_path.touch()
+    _, dir_mtimes, _, _ = mtimes.find_changed_mtimes(tmp_dir_path, {})
+    nested_new_path = nested_path.parent / "new"
+    nested_new_path.touch()
+    os.utime(str(nested_path.parent), (1, 1))
+
+    result, dirs, unchanged, errors = mtimes.find_changed_mtimes(
+        tmp_dir_path,
+        dir_mtimes,
+    )
+
+    assert result == {
+        nested_path: tests.IsA(int),
+        nested_new_path: tests.IsA(int),
+    }
+    assert set(dirs) == {tmp_dir_path, old_path.parent, nested_path.parent}
+    assert unchanged == {tmp_dir_path, old_path.parent}
+    assert errors == {}
+
+
+@pytest.mark.parametrize("thread_count", [1, 2, 10])
+def test_thread_count_does_not_change_the_result(tmp_dir_path, thread_count):
+    paths = []
+    for i in range(5):
+        for j in range(5):
+            file_path = tmp_dir_path / f"dir{i}" / f"sub{j}" / "file"
+            file_path.parent.mkdir(parents=True)
+            file_path.touch()
+            paths.append(file_path)
+
+    result, errors = mtimes.find_mtimes(tmp_dir_path, thread_count=thread_count)
+
+    assert result == dict.fromkeys(paths, tests.IsA(int))
+    assert errors == {}
+
+
+def test_directory_linked_twice_is_searched_once(tmp_dir_path):
+    file_path = tmp_dir_path / "dir" / "file"
+    file_path.parent.mkdir()
+    file_path.touch()
+    link1_path = tmp_dir_path / "link1"
+    link1_path.symlink_to(file_path.parent, target_is_directory=True)
+    link2_path = tmp_dir_path / "link2"
+    link2_path.symlink_to(file_path.parent, target_is_directory=True)
+
+    result, errors = mtimes.find_mtimes(tmp_dir_path, follow=True)
+
+    assert len(result) == 1
+    assert len(errors) == 2
+
+
+def test_skipped_files_are_only_logged_at_debug_level(tmp_dir_path, caplog):
+    hidden_path = tmp_dir_path / ".hidden"
+    hidden_path.touch()
+    file_filter = mtimes.FileFilter(skip_hidden=True)
+
+    with caplog.at_level(logging.INFO, logger="mopidy_local"):
+        mtimes.find_mtimes(tmp_dir_path, file_filter=file_filter)
+    assert caplog.text == ""
+
+    with caplog.at_level(logging.DEBUG, logger="mopidy_local"):
+        mtimes.find_mtimes(tmp_dir_path, file_filter=file_filter)
+    assert f"Skipped {hidden_path.as_uri()}: Hidden file" in caplog.text
+
+
+def test_file_filter_skips_hidden_directories_and_files(tmp_dir_path):
+    file_path = tmp_dir_path / "dir" / "file"
+    file_path.parent.mkdir()
+    file_path.touch()
+    (tmp_dir_path / "dir" / ".hidden").touch()
+    (tmp_dir_path / ".git" / "objects").mkdir(parents=True)
+    (tmp_dir_path / ".git" / "objects" / "file").touch()
+    file_filter = mtimes.FileFilter(skip_hidden=True)
+
+    result, dirs, _, errors = mtimes.find_changed_mtimes(
+        tmp_dir_path,
+        {},
+        file_filter=file_filter,
+    )
+
+    assert result == {file_path: tests.IsA(int)}
+    assert set(dirs) == {tmp_dir_path, file_path.parent}
+    assert errors == {}
+
+
+def test_file_filter_skips_excluded_extensions(tmp_dir_path):
+    file_path = tmp_dir_path / "song.flac"
+    file_path.touch()
+    (tmp_dir_path / "cover.JPG").touch()
+    file_filter = mtimes.FileFilter(excluded_extensions=[".jpg"])
+
+    result, errors = mtimes.find_mtimes(tmp_dir_path, file_filter=file_filter)
+
+    assert result == {file_path: tests.IsA(int)}
+    assert errors == {}
+
+
+def test_file_filter_included_extensions_override_excluded(tmp_dir_path):
+    file_path = tmp_dir_path / "song.flac"
+    file_path.touch()
+    (tmp_dir_path / "song.mp3").touch()
+    file_filter = mtimes.FileFilter(
+        included_extensions=[".FLAC"],
+        excluded_extensions=[".flac"],
+    )
+
+    result, errors = mtimes.find_mtimes(tmp_dir_path, file_filter=file_filter)
+
+    assert result == {file_path: tests.IsA(int)}
+    assert errors == {}
+
+
+def test_file_filter_is_applied_to_file_as_the_root(tmp_dir_path):
+    file_path = tmp_dir_path / "cover.jpg"
+    file_path.touch()
+    file_filter = mtimes.FileFilter(excluded_extensions=[".jpg"])
+
+    result, errors = mtimes.find_mtimes(file_path, file_filter=file_filter)
+
+    assert result == {}
+    assert errors == {}
+
+
+def test_file_filter_is_not_applied_to_directory_as_the_root(tmp_dir_path):
+    file_path = tmp_dir_path / ".music" / "song.flac"
+    file_path.parent.mkdir()
+    file_path.touch()
+    file_filter = mtimes.FileFilter(skip_hidden=True)
+
+    result, errors = mtimes.find_mtimes(file_path.parent, file_filter=file_filter)
+
+    assert result == {file_path: tests.IsA(int)}
+    assert errors == {}
+
+
+@pytest.mark.parametrize(
+    ("relative_path", "excluded"),
+    [
+        ("artist/album/song.flac", False),
+        ("artist/album/cover.jpg", True),
+        ("artist/.album/song.flac", True),
+        ("artist/album/.song.flac", True),
+        ("artist/album/song", False),
+    ],
+)
+def test_file_filter_excludes_path(relative_path, excluded):
+    file_filter = mtimes.FileFilter(skip_hidden=True, excluded_extensions=[".jpg"])
+
+    reason = file_filter.excludes_path(pathlib.Path(relative_path))
+
+    assert (reason is not None) == excluded
+
+
+def test_file_filter_prunes_directories_matching_exclude_patterns(tmp_dir_path):
+    file_path = tmp_dir_path / "artist" / "song.flac"
+    file_path.parent.mkdir()
+    file_path.touch()
+    (tmp_dir_path / "artist" / "song.flac.part").touch()
+    samples_path = tmp_dir_path / "artist" / "Samples"
+    samples_path.mkdir()
+    (samples_path / "kick.flac").touch()
+    file_filter = mtimes.FileFilter(
+        root=tmp_dir_path,
+        exclude_patterns=["**/Samples/**", "*.part"],
+    )
+
+    result, dirs, _, errors = mtimes.find_changed_mtimes(
+        tmp_dir_path,
+        {},
+        file_filter=file_filter,
+    )
+
+    assert result == {file_path: tests.IsA(int)}
+    assert samples_path not in dirs
+    assert errors == {}
+
+
+def test_file_filter_include_patterns_are_relative_to_root(tmp_dir_path):
+    file_path = tmp_dir_path / "artist" / "album" / "song.flac"
+    file_path.parent.mkdir(parents=True)
+    file_path.touch()
+    (tmp_dir_path / "artist" / "song.flac").touch()
+    file_filter = mtimes.FileFilter(
+        root=tmp_dir_path,
+        include_patterns=["/*/album/*.flac"],
+    )
+
+    result, errors = mtimes.find_mtimes(
+        tmp_dir_path / "artist",
+        file_filter=file_filter,
+    )
+
+    assert result == {file_path: tests.IsA(int)}
+    assert errors == {}
+
+
+@pytest.mark.parametrize(
+    ("pattern", "relative_path", "is_dir", "excluded"),
+    [
+        ("*.part", "song.part", False, True),
+        ("*.part", "artist/album/song.part", False, True),
+        ("*.part", "song.part.flac", False, False),
+        ("/Samples", "Samples", True, True),
+        ("/Samples", "artist/Samples", True, False),
+        ("Samples/", "artist/Samples", True, True),
+        ("Samples/", "artist/Samples", False, False),
+        ("**/Samples/**", "Samples/kick.flac", False, True),
+        ("**/Samples/**", "artist/Samples", True, True),
+        ("artist/**/live", "artist/live", True, True),
+        ("artist/**/live", "artist/2001/live", True, True),
+        ("track?.flac", "track1.flac", False, True),
+        ("track?.flac", "track10.flac", False, False),
+        ("track[!0-4].flac", "track5.flac", False, True),
+        ("track[!0-4].flac", "track3.flac", False, False),
+    ],
+)
+def test_file_filter_exclude_patterns(pattern, relative_path, is_dir, excluded):
+    file_filter = mtimes.FileFilter(exclude_patterns=[pattern])
+
+    reason = file_filter.excludes_path(pathlib.Path(relative_path), is_dir=is_dir)
+
+    assert (reason is not None) == excluded
@@ -1,7 +1,10 @@
+import pathlib
 import sqlite3
+import tempfile
+import time
 import unittest
 
-from mopidy.models import Album, Artist, ModelType, Ref, Track
+from mopidy.models import Album, Artist, Image, ModelType, Ref, Track
 
 from mopidy_local import schema
 
@@ -104,9 +107,9 @@ class SchemaTest(unittest.TestCase):
             self.connection,
             "performer",
         )
-        assert [
+        assert sorted(
             track.date for track in self.tracks if track.date
-        ] == schema.list_distinct(self.connection, "date")
+        ) == schema.list_distinct(self.connection, "date")
         assert [self.tracks[0].genre] == schema.list_distinct(self.connection, "genre")
         assert [str(self.tracks[4].musicbrainz_id)] == schema.list_distinct(
             self.connection,
@@ -129,6 +132,21 @@ class SchemaTest(unittest.TestCase):
             results = schema.dates(c, format="%Y")
             assert results == ["2014", "2015", "2020"]
 
+            results = schema.dates(c, format="%Y-%m")
+            assert results == ["2015-03", "2020-09", "2020-10"]
+
+    def test_dates_walk_year_index(self):
+        c = self.connection
+        statements = []
+        c.set_trace_callback(statements.append)
+        schema.dates(c, format="%Y")
+        c.set_trace_callback(None)
+
+        plan = c.execute(f"EXPLAIN QUERY PLAN {statements[-1]}").fetchall()
+        details = [row.detail for row in plan]
+        assert any("COVERING INDEX track_year_index" in d for d in details)
+        assert not any("TEMP B-TREE" in detail for detail in details)
+
     def test_lookup_track(self):
         with self.connection as c:
             for track in self.tracks:
@@ -154,6 +172,34 @@ class SchemaTest(unittest.TestCase):
             result = schema.lookup(c, ModelType.ARTIST, self.artists[1].uri)
             assert [self.tracks[4]] == list(result)
 
+    def test_lookup_artist_orders_by_album_disc_and_track(self):
+        c = self.connection
+        album = self.albums[1]
+        tracks = [
+            Track(uri="local:track:d2t1", name="c", album=album, disc_no=2, track_no=1),
+            Track(uri="local:track:d1t2", name="a", album=album, disc_no=1, track_no=2),
+            Track(uri="local:track:d1t1", name="b", album=album, disc_no=1, track_no=1),
+        ]
+        schema.insert_tracks(c, [(track, None) for track in tracks])
+
+        result = schema.lookup(c, ModelType.ARTIST, self.artists[0].uri)
+
+        assert [track.uri for track in result] == [
+            self.tracks[1].uri,
+            self.tracks[3].uri,
+            "local:track:d1t1",
+            "local:track:d1t2",
+            "local:track:d2t1",
+        ]
+
+    def test_lookup_artist_uses_artist_indexes(self):
+        c = self.connection
+        sql = schema._LOOKUP_QUERIES[ModelType.ARTIST]
+        plan = c.execute(f"EXPLAIN QUERY PLAN {sql}", [self.artists[0].uri])
+        details = [row.detail for row in plan]
+        assert any("track_artists_index" in detail for detail in details)
+        assert any("album_artists_index" in detail for detail in details)
+
     @unittest.SkipTest  # TODO: check indexed search
     def test_indexed_search(self):
         for results, query, filters in [
@@ -202,6 +248,97 @@ class SchemaTest(unittest.TestCase):
                 tracks = schema.search_tracks(c, query, 10, 0, False, filters)
             assert set(results) == {t.uri for t in tracks}
 
+    def test_fulltext_search_ranks_best_matches_first(self):
+        c = self.connection
+        tracks = [
+            Track(uri="local:track:new0", name="a song about love and loss"),
+            Track(
+                uri="local:track:new1",
+                name="love",
+                album=Album(uri="local:album:new", name="love"),
+            ),
+        ]
+        schema.insert_tracks(c, [(track, None) for track in tracks])
+
+        assert schema.search_tracks(c, [("any", "love")], 1, 0, False) == tracks[1:]
+
+    def test_fulltext_search_matches_prefixes_without_diacritics(self):
+        c = self.connection
+        track = Track(uri="local:track:new", name="Beyoncé")
+        schema.insert_track(c, track)
+
+        for query in ["beyon", "BEYONCE", "Beyoncé"]:
+            with self.subTest(query=query):
+                tracks = schema.search_tracks(c, [("track_name", query)], 10, 0, False)
+                assert tracks == [track]
+
+    def test_fulltext_search_quotes_words(self):
+        c = self.connection
+        for query in ['"track', "track AND", "NOT track", "track*", "uri:track", ""]:
+            with self.subTest(query=query):
+                schema.search_tracks(c, [("any", query)], 10, 0, False)
+
+    def test_search_table_matches_source(self):
+        c = self.connection
+        schema.delete_tracks(c, [self.tracks[0].uri])
+        schema.insert_track(c, self.tracks[1].replace(name="renamed"))
+
+        rows = c.execute("SELECT * FROM search ORDER BY docid").fetchall()
+        source = c.execute("SELECT * FROM search_source ORDER BY docid").fetchall()
+        assert list(map(tuple, rows)) == list(map(tuple, source))
+
+    def test_search_table_follows_album_and_artist_updates(self):
+        c = self.connection
+        c.execute("UPDATE album SET name = 'new album' WHERE uri = 'local:album:2'")
+        c.execute("UPDATE artist SET name = 'new artist' WHERE uri = 'local:artist:0'")
+
+        for field, value, uris in [
+            ("album", "new album", ["local:track:4"]),
+            ("artist", "new artist", ["local:track:1"]),
+            ("composer", "new artist", ["local:track:4"]),
+            ("albumartist", "new artist", ["local:track:3"]),
+        ]:
+            for exact in [True, False]:
+                with self.subTest(field=field, exact=exact):
+                    query = [(field, value)]
+                    tracks = schema.search_tracks(c, query, 10, 0, exact)
+                    assert [track.uri for track in tracks] == uris
+
+    def test_indexed_search_uses_search_index(self):
+        c = self.connection
+        sql, params = schema._indexed_query([("artist", "artist #0")])
+        plan = c.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+        details = [row.detail for row in plan]
+        assert any("search_artist_index" in detail for detail in details)
+
+    def test_search_values_match_source(self):
+        c = self.connection
+        schema.delete_tracks(c, [self.tracks[0].uri])
+        schema.insert_track(c, self.tracks[1].replace(name="renamed", track_no=3))
+        c.execute("UPDATE artist SET name = 'new artist' WHERE uri = 'local:artist:0'")
+
+        rows = c.execute("SELECT value, docid FROM search_value ORDER BY 1, 2")
+        source = c.execute(
+            "SELECT DISTINCT value, docid FROM search_value_source ORDER BY 1, 2"
+        )
+        assert list(map(tuple, rows)) == list(map(tuple, source))
+
+    def test_indexed_search_any_matches_numbers(self):
+        c = self.connection
+        track = self.tracks[1].replace(track_no=3)
+        schema.insert_track(c, track)
+
+        assert schema.search_tracks(c, [("any", "3")], 10, 0, True) == [track]
+        assert schema.list_distinct(c, "track_name", [("any", "3")]) == [track.name]
+
+    def test_indexed_search_any_uses_search_value_index(self):
+        c = self.connection
+        sql, params = schema._indexed_query([("any", "artist #0")])
+        plan = c.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+        details = [row.detail for row in plan]
+        assert any("SEARCH search_value USING" in detail for detail in details)
+        assert not any(detail.startswith("SCAN") for detail in details)
+
     def test_browse_artists(self):
         def ref(artist):
             return Ref.artist(name=artist.name, uri=artist.uri)
@@ -279,6 +416,243 @@ class SchemaTest(unittest.TestCase):
                 performer=self.artists[0].uri,
             )
 
+    def test_browse_by_date(self):
+        def refs(*tracks):
+            return [Ref.track(name=track.name, uri=track.uri) for track in tracks]
+
+        c = self.connection
+        t = self.tracks
+        assert refs(t[2], t[3]) == schema.browse(c, ModelType.TRACK, date="2020")
+        assert refs(t[2]) == schema.browse(c, ModelType.TRACK, date="2020-09")
+        assert refs(t[0]) == schema.browse(c, ModelType.TRACK, date="2015-03-15")
+        assert refs() == schema.browse(c, ModelType.TRACK, date="2014-01")
+        assert refs() == schema.browse(c, ModelType.TRACK, date="2016")
+        assert refs(t[1]) == schema.browse(c, None, date="2014")
+        albums = [Ref.album(name=a.name, uri=a.uri) for a in self.albums[0:2]]
+        assert albums == schema.browse(c, ModelType.ALBUM, date="2020")
+
+    def test_browse_by_date_uses_year_index(self):
+        c = self.connection
+        for type_ in (None, ModelType.ALBUM, ModelType.TRACK):
+            statements = []
+            c.set_trace_callback(statements.append)
+            schema.browse(c, type_, date="2020")
+            c.set_trace_callback(None)
+
+            plan = c.execute(f"EXPLAIN QUERY PLAN {statements[-1]}")
+            assert any("track_year_index" in row.detail for row in plan)
+
+    def test_browse_by_max_age(self):
+        c = self.connection
+        now = int(time.time()) * 1000
+        album = self.albums[1]
+        tracks = [
+            Track(uri="local:track:old", name="old", last_modified=now - 7200_000),
+            Track(uri="local:track:new", name="new", album=album, last_modified=now),
+        ]
+        for track in tracks:
+            schema.insert_track(c, track)
+
+        assert [Ref.track(name="new", uri="local:track:new")] == schema.browse(
+            c, ModelType.TRACK, **{"max-age": "3600"}
+        )
+        assert [Ref.album(name=album.name, uri=album.uri)] == schema.browse(
+            c, ModelType.ALBUM, **{"max-age": "3600"}
+        )
+        assert len(schema.browse(c, ModelType.TRACK, **{"max-age": "86400"})) == 2
+
+    def test_browse_by_fractional_or_invalid_max_age(self):
+        c = self.connection
+        now = int(time.time()) * 1000
+        schema.insert_track(
+            c, Track(uri="local:track:old", name="old", last_modified=now - 7200_000)
+        )
+
+        assert not schema.browse(c, ModelType.TRACK, **{"max-age": "3600.5"})
+        assert len(schema.browse(c, ModelType.TRACK, **{"max-age": "7260.5"})) == 1
+        assert not schema.browse(c, ModelType.TRACK, **{"max-age": "soon"})
+        assert not schema.search_tracks(c, [], 10, 0, False, [{"max-age": "soon"}])
+
+    def test_browse_by_max_age_uses_album_index(self):
+        c = self.connection
+        statements = []
+        c.set_trace_callback(statements.append)
+        schema.browse(c, ModelType.ALBUM, **{"max-age": "604800"})
+        c.set_trace_callback(None)
+
+        plan = c.execute(f"EXPLAIN QUERY PLAN {statements[-1]}").fetchall()
+        details = [row.detail for row in plan]
+        assert any("album_last_modified_index" in d for d in details)
+        assert not any("track" in detail for detail in details)
+
+    def test_album_last_modified(self):
+        c = self.connection
+        album = self.albums[0]
+
+        def last_modified(uri=album.uri):
+            query = "SELECT last_modified FROM album WHERE uri = ?"
+            return c.execute(query, [uri]).fetchone()[0]
+
+        track = self.tracks[2]
+        schema.insert_track(c, track.replace(last_modified=1000))
+        assert last_modified() == 1000
+        schema.insert_track(c, Track(uri="local:track:x", album=album, name="x"))
+        schema.insert_track(c, track.replace(last_modified=3000))
+        assert last_modified() == 3000
+        schema.insert_track(c, track.replace(last_modified=2000))
+        assert last_modified() == 2000
+        schema.insert_track(c, track.replace(album=self.albums[1], last_modified=2000))
+        assert last_modified() is None
+        assert last_modified(self.albums[1].uri) == 2000
+        schema.delete_track(c, track.uri)
+        assert last_modified(self.albums[1].uri) is None
+
+    def test_album_last_modified_does_not_update_search(self):
+        c = self.connection
+        c.execute(
+            """
+            CREATE TEMP TRIGGER search_delete AFTER DELETE ON search BEGIN
+                SELECT raise(ABORT, 'deleted');
+            END
+            """
+        )
+        c.execute("UPDATE album SET last_modified = 1000")
+
+        with self.assertRaises(sqlite3.IntegrityError):
+            c.execute("UPDATE album SET name = 'renamed'")
+
+    def test_album_name_key_does_not_update_search(self):
+        c = self.connection
+        c.execute(
+            """
+            CREATE TEMP TRIGGER search_delete AFTER DELETE ON search BEGIN
+                SELECT raise(ABORT, 'deleted');
+            END
+            """
+        )
+        c.execute("UPDATE album SET name_key = 'key'")
+
+        with self.assertRaises(sqlite3.IntegrityError):
+            c.execute("UPDATE album SET name = 'renamed'")
+
+    def test_browse_ignores_case_and_accents(self):
+        names = ["Zed", "eve", "\u00c9mile", "E\u0301douard"]
+        for i, name in enumerate(names):
+            track = Track(
+                uri=f"local:track:sort{i}.mp3",
+                name=f"track {i}",
+                artists=[Artist(uri=f"local:artist:sort{i}", name=name)],
+            )
+            schema.insert_track(self.connection, track)
+
+        refs = schema.browse(
+            self.connection, ModelType.ARTIST, ("sortkey", "uri"), role="artist"
+        )
+
+        assert [ref.name for ref in refs] == [
+            "artist #0",
+            "E\u0301douard",
+            "\u00c9mile",
+            "eve",
+            "Zed",
+        ]
+
+    def test_browse_walks_sort_key_index(self):
+        c = self.connection
+        statements = []
+        c.set_trace_callback(statements.append)
+        schema.browse(c, ModelType.ALBUM, ("sortkey", "uri"))
+        c.set_trace_callback(None)
+
+        plan = c.execute(f"EXPLAIN QUERY PLAN {statements[-1]}").fetchall()
+        details = [row.detail for row in plan]
+        assert any("COVERING INDEX album_name_key_index" in d for d in details)
+        assert not any("TEMP B-TREE" in detail for detail in details)
+
+    def test_iter_browse(self):
+        tracks = [
+            Track(uri="local:track:b", name="Same"),
+            Track(uri="local:track:a", name="same"),
+            Track(uri="local:track:c", name="a track"),
+        ]
+        for track in tracks:
+            schema.insert_track(self.connection, track)
+
+        with self.connection as c:
+            rows = list(schema.iter_browse(c, ModelType.TRACK))
+            uris = [ref.uri for _, ref in rows]
+            assert uris[:3] == ["local:track:c", "local:track:a", "local:track:b"]
+            assert len(uris) == len(self.tracks) + len(tracks)
+            for i, (sortkey, ref) in enumerate(rows):
+                after = list(
+                    schema.iter_browse(c, ModelType.TRACK, after=(sortkey, ref.uri))
+                )
+                assert after == rows[i + 1 :]
+
+    def test_iter_browse_with_key(self):
+        with self.connection as c:
+            rows = list(
+                schema.iter_browse(
+                    c,
+                    ModelType.ARTIST,
+                    "coalesce(sortname, name)",
+                    role="artist",
+                )
+            )
+        assert rows == [
+            (
+                self.artists[0].name,
+                Ref.artist(name=self.artists[0].name, uri=self.artists[0].uri),
+            )
+        ]
+
+    def test_iter_browse_uses_name_index(self):
+        c = self.connection
+        statements = []
+        c.set_trace_callback(statements.append)
+        after = ("track #2", self.tracks[2].uri)
+        list(schema.iter_browse(c, ModelType.TRACK, after=after))
+        c.set_trace_callback(None)
+
+        plan = c.execute(f"EXPLAIN QUERY PLAN {statements[-1]}").fetchall()
+        details = [row.detail for row in plan]
+        assert any("USING COVERING INDEX track_name_key_index (" in d for d in details)
+        assert not any("TEMP B-TREE" in detail for detail in details)
+
+    def test_sort_key(self):
+        assert schema.sort_key("Beyonc\u00e9") == "beyonce"
+        assert schema.sort_key("Stra\u00dfe") == "strasse"
+        assert schema.sort_key("The Beatles") == "the beatles"
+        assert schema.sort_key("The Beatles", {"the"}) == "beatles"
+        assert schema.sort_key("The", {"the"}) == "the"
+        assert schema.sort_key("Theatre", {"the"}) == "theatre"
+
+    def test_insert_tracks_with_articles(self):
+        artist = Artist(uri="local:artist:the", name="The The", sortname="The, The")
+        track = Track(uri="local:track:the", name="A track", artists=[artist])
+
+        schema.insert_tracks(self.connection, [(track, None)], articles=["The", "A"])
+
+        row = self.connection.execute(
+            "SELECT name_key, sortname_key FROM artist WHERE uri = ?", [artist.uri]
+        ).fetchone()
+        assert tuple(row) == ("the", "the, the")
+        row = self.connection.execute(
+            "SELECT name_key FROM track WHERE uri = ?", [track.uri]
+        ).fetchone()
+        assert tuple(row) == ("track",)
+
+    def test_update_sort_keys(self):
+        c = self.connection
+        schema.insert_track(c, Track(uri="local:track:the", name="The End"))
+        c.execute("UPDATE album SET name_key = NULL")
+
+        assert schema.update_sort_keys(c) == len(self.albums)
+        assert schema.update_sort_keys(c) == 0
+        assert schema.update_sort_keys(c, ["the"]) == 1
+        row = c.execute("SELECT name_key FROM track ORDER BY name_key").fetchone()
+        assert row.name_key == "end"
+
     def test_delete(self):
         c = self.connection
         schema.delete_track(c, self.tracks[0].uri)
@@ -306,6 +680,255 @@ class SchemaTest(unittest.TestCase):
         assert len(c.execute("SELECT * FROM album").fetchall()) == 0
         assert len(c.execute("SELECT * FROM artist").fetchall()) == 0
 
+    def test_delete_tracks(self):
+        c = self.connection
+        uris = [self.tracks[0].uri, self.tracks[2].uri, "local:track:missing"]
+
+        assert schema.delete_tracks(c, uris) == 2
+
+        assert schema.track_uris(c) == [
+            self.tracks[1].uri,
+            self.tracks[3].uri,
+            self.tracks[4].uri,
+        ]
+        docids = c.execute("SELECT rowid FROM fts ORDER BY rowid").fetchall()
+        rowids = c.execute("SELECT rowid FROM track ORDER BY rowid").fetchall()
+        assert list(map(tuple, docids)) == list(map(tuple, rowids))
+
+    def test_delete_tracks_keeps_delete_trigger(self):
+        c = self.connection
+        schema.delete_tracks(c, [self.tracks[0].uri])
+
+        schema.delete_track(c, self.tracks[1].uri)
+
+        assert c.execute("SELECT count(*) FROM fts").fetchone()[0] == 3
+
+    def test_insert_tracks(self):
+        c = self.connection
+        artist = Artist(uri="local:artist:new", name="new artist")
+        album = Album(uri="local:album:new", name="new album", artists=[artist])
+        tracks = [
+            Track(uri=f"local:track:new{i}", name=f"new #{i}", album=album)
+            for i in range(3)
+        ]
+
+        assert schema.insert_tracks(c, [(track, ["/image.png"]) for track in tracks])
+
+        assert schema.count_tracks(c) == 8
+        assert list(schema.lookup(c, ModelType.ALBUM, album.uri)) == tracks
+        assert schema.get_album_images(c, album.uri) == [Image(uri="/image.png")]
+        assert len(schema.search_tracks(c, [("album", "new")], 10, 0, False)) == 3
+
+    def test_insert_tracks_inserts_none_on_error(self):
+        c = self.connection
+        tracks = [
+            Track(uri="local:track:new", name="new"),
+            Track(uri="local:track:noname"),
+        ]
+
+        with self.assertRaises(sqlite3.IntegrityError):
+            schema.insert_tracks(c, [(track, None) for track in tracks])
+
+        assert schema.count_tracks(c) == 5
+
+    def test_insert_tracks_updates_changed_albums_only(self):
+        c = self.connection
+        c.execute(
+            """
+            CREATE TEMP TRIGGER album_update AFTER UPDATE ON album BEGIN
+                SELECT raise(ABORT, 'updated');
+            END
+            """
+        )
+        schema.insert_tracks(c, [(track, None) for track in self.tracks])
+
+        with self.assertRaises(sqlite3.IntegrityError):
+            schema.insert_tracks(c, [(self.tracks[2], ["/image.png"])])
+
+    def test_insert_tracks_skips_written_rows(self):
+        c = self.connection
+        written = set()
+        schema.insert_tracks(c, [(self.tracks[4], None)], written)
+        assert len(written) == 3  # album, album artist and composer
+
+        c.execute(
+            """
+            CREATE TEMP TRIGGER artist_insert BEFORE INSERT ON artist BEGIN
+                SELECT raise(ABORT, 'inserted');
+            END
+            """
+        )
+        schema.insert_tracks(c, [(self.tracks[4], None)], written)
+
+    def test_insert_tracks_skips_unchanged_tracks(self):
+        c = self.connection
+        changes = c.total_changes
+
+        schema.insert_tracks(c, [(track, None) for track in self.tracks])
+
+        assert c.total_changes == changes
+
+    def test_insert_tracks_updates_changed_tracks(self):
+        c = self.connection
+        track = self.tracks[1].replace(name="renamed")
+
+        schema.insert_tracks(c, [(track, None)])
+
+        assert list(schema.lookup(c, ModelType.TRACK, track.uri)) == [track]
+        assert schema.search_tracks(c, [("track_name", "renamed")], 10, 0, False)
+        assert not schema.search_tracks(c, [("track_name", "#1")], 10, 0, False)
+
+    def test_insert_tracks_updates_tracks_of_changed_album(self):
+        c = self.connection
+        album = self.albums[1].replace(name="renamed")
+        track = self.tracks[3].replace(album=album)
+
+        schema.insert_tracks(c, [(track, None)])
+
+        assert schema.search_tracks(c, [("album", "renamed")], 10, 0, False)
+
+    def test_insert_tracks_updates_track_with_shared_values(self):
+        c = self.connection
+        artist = self.artists[0]
+        album = Album(uri="local:album:new", name="album", artists=[artist])
+        track = Track(uri="local:track:new", name="new", artists=[artist], album=album)
+        schema.insert_tracks(c, [(track, None)])
+
+        schema.insert_tracks(c, [(track.replace(name="renamed"), None)])
+
+        assert schema.search_tracks(c, [("track_name", "renamed")], 10, 0, True)
+        assert schema.search_tracks(c, [("any", artist.name)], 10, 0, True)
+
+    def test_insert_tracks_updates_album_with_shared_values(self):
+        c = self.connection
+        artist = self.artists[0]
+        album = Album(uri="local:album:new", name="album", artists=[artist])
+        track = Track(uri="local:track:new", name="new", artists=[artist], album=album)
+        schema.insert_tracks(c, [(track, None)])
+        album = album.replace(name="renamed")
+
+        schema.insert_tracks(c, [(track.replace(album=album), None)])
+
+        assert schema.search_tracks(c, [("album", "renamed")], 10, 0, True)
+        assert schema.search_tracks(c, [("any", artist.name)], 10, 0, True)
+
+    def test_fulltext_index_deferred(self):
+        c = self.connection
+        track = Track(uri="local:track:new", name="new track")
+
+        with schema.fulltext_index_deferred(c):
+            schema.insert_track(c, track)
+            schema.insert_track(c, self.tracks[1].replace(name="renamed"))
+            schema.delete_track(c, self.tracks[0].uri)
+        assert not schema.search_tracks(c, [("any", "new")], 10, 0, False)
+        assert schema.fulltext_rebuild_pending(c)
+
+        schema.rebuild_fulltext_index(c)
+
+        assert not schema.fulltext_rebuild_pending(c)
+        assert schema.search_tracks(c, [("any", "new")], 10, 0, False) == [track]
+        assert schema.search_tracks(c, [("any", "renamed")], 10, 0, False)
+        docids = c.execute("SELECT rowid FROM fts ORDER BY rowid").fetchall()
+        rowids = c.execute("SELECT rowid FROM track ORDER BY rowid").fetchall()
+        assert list(map(tuple, docids)) == list(map(tuple, rowids))
+
+    def test_fulltext_index_deferred_restores_triggers(self):
+        c = self.connection
+        triggers = "SELECT count(*) FROM sqlite_master WHERE type = 'trigger'"
+        count = c.execute(triggers).fetchone()[0]
+
+        with schema.fulltext_index_deferred(c):
+            remaining = count - len(schema._SEARCH_TRIGGERS)
+            assert c.execute(triggers).fetchone()[0] == remaining
+
+        assert c.execute(triggers).fetchone()[0] == count
+
+    def test_fulltext_index_deferred_rolls_back_on_error(self):
+        c = self.connection
+
+        with self.assertRaises(ValueError), schema.fulltext_index_deferred(c):
+            schema.insert_track(c, Track(uri="local:track:new", name="new"))
+            raise ValueError
+
+        assert schema.count_tracks(c) == 5
+        schema.insert_track(c, Track(uri="local:track:new", name="new"))
+        assert schema.search_tracks(c, [("any", "new")], 10, 0, False)
+        assert not schema.fulltext_rebuild_pending(c)
+
+    def test_load_rebuilds_deferred_fulltext_index(self):
+        c = self.connection
+        track = Track(uri="local:track:new", name="new track")
+        with schema.fulltext_index_deferred(c):
+            schema.insert_track(c, track)
+        c.commit()
+
+        schema.load(c)
+
+        assert not schema.fulltext_rebuild_pending(c)
+        assert schema.search_tracks(c, [("any", "new")], 10, 0, False) == [track]
+
+    def test_track_uris(self):
+        c = self.connection
+        assert schema.track_uris(c) == [track.uri for track in self.tracks]
+        assert schema.track_uris(c, "local:track:3") == [self.tracks[3].uri]
+        assert schema.track_uris(c, "local:track:5") == []
+
+    def test_cleanup_tracks(self):
+        c = self.connection
+        track = self.tracks[3]
+        schema.insert_scan_failure(c, track.uri, 1000, "No audio")
+        schema.insert_scan_failure(c, self.tracks[2].uri, 1000, "No audio")
+
+        albums, artists = schema.track_references(c, [track.uri])
+        schema.delete_track(c, track.uri)
+        schema.cleanup_tracks(c, [track.uri, self.tracks[2].uri], albums, artists)
+
+        assert albums == {self.albums[1].uri}
+        assert artists == {self.artists[0].uri}
+        assert not schema.lookup(c, ModelType.ALBUM, self.albums[1].uri)
+        assert schema.lookup(c, ModelType.ARTIST, self.artists[0].uri)
+        assert schema.scan_failures(c) == {track.uri: 1000}
+
+    def test_scan_failures(self):
+        c = self.connection
+        schema.insert_scan_failure(c, "local:track:booklet.pdf", 1000, "No audio")
+        schema.insert_scan_failure(c, self.tracks[0].uri, 2000)
+        assert schema.scan_failures(c) == {
+            "local:track:booklet.pdf": 1000,
+            self.tracks[0].uri: 2000,
+        }
+
+        schema.insert_scan_failure(c, "local:track:booklet.pdf", 3000, "No audio")
+        assert schema.scan_failures(c)["local:track:booklet.pdf"] == 3000
+
+        # Failures for files which made it into the library are forgotten
+        schema.cleanup(c)
+        assert schema.scan_failures(c) == {"local:track:booklet.pdf": 3000}
+
+        schema.delete_scan_failure(c, "local:track:booklet.pdf")
+        assert schema.scan_failures(c) == {}
+
+    def test_scan_directories(self):
+        c = self.connection
+        schema.replace_scan_directories(
+            c,
+            {"local:directory:.": 1000, "local:directory:A": 2000},
+        )
+        assert schema.scan_directories(c) == {
+            "local:directory:.": 1000,
+            "local:directory:A": 2000,
+        }
+
+        schema.replace_scan_directories(c, {"local:directory:B": 3000})
+        assert schema.scan_directories(c) == {"local:directory:B": 3000}
+
+    def test_scan_directories_with_other_filter(self):
+        c = self.connection
+        schema.replace_scan_directories(c, {"local:directory:.": 1000}, "[[]]")
+        assert schema.scan_directories(c, "[[]]") == {"local:directory:.": 1000}
+        assert schema.scan_directories(c, '[[".txt"]]') == {}
+        assert schema.scan_directories(c) == {}
+
     def test_tracks_skips_track_with_invalid_date(self):
         # Databases created before we validated our models can hold dates in
         # any format. See mopidy-local#92.
@@ -331,6 +954,36 @@ class SchemaTest(unittest.TestCase):
         assert len(tracks) == len(self.tracks) - 1
         assert self.tracks[2].uri not in [track.uri for track in tracks]
 
+    def test_track_mtimes(self):
+        self.connection.execute("UPDATE track SET last_modified = 1000")
+
+        assert dict(schema.track_mtimes(self.connection)) == {
+            track.uri: 1000 for track in self.tracks
+        }
+
+    def test_track_mtimes_has_no_mtime_for_track_with_invalid_data(self):
+        self.connection.execute("UPDATE track SET last_modified = 1000")
+        self.connection.execute(
+            "UPDATE track SET date = '31-12-2006' WHERE uri = ?",
+            [self.tracks[0].uri],
+        )
+        self.connection.execute(
+            "UPDATE album SET date = '12-1996' WHERE uri = ?",
+            [self.albums[0].uri],
+        )
+
+        mtimes = dict(schema.track_mtimes(self.connection))
+
+        # The same tracks which are skipped by schema.tracks()
+        assert mtimes == {
+            self.tracks[0].uri: None,
+            self.tracks[1].uri: 1000,
+            self.tracks[2].uri: None,
+            self.tracks[3].uri: 1000,
+            self.tracks[4].uri: 1000,
+        }
+        assert len(schema.tracks(self.connection)) == 3
+
     def test_lookup_skips_track_with_invalid_date(self):
         self.connection.execute(
             "UPDATE track SET date = '31-12-2006' WHERE uri = ?",
@@ -351,3 +1004,52 @@ class SchemaTest(unittest.TestCase):
 
         assert len(result) == len(self.tracks) - 1
         assert self.tracks[0].uri not in [track.uri for track in result]
+
+
+class JournalModeTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.dbpath = pathlib.Path(self.tmpdir.name) / "library.db"
+        self.connection = self.connect()
+        schema.load(self.connection)
+
+    def tearDown(self):
+        self.connection.close()
+        self.connection = None
+        self.tmpdir.cleanup()
+
+    def connect(self):
+        return sqlite3.connect(self.dbpath, factory=schema.Connection, timeout=0)
+
+    def test_set_journal_mode(self):
+        assert schema.set_journal_mode(self.connection, "wal") == "wal"
+        assert schema.set_journal_mode(self.connection, "delete") == "delete"
+
+    def test_set_journal_mode_in_memory(self):
+        with sqlite3.connect(DBPATH, factory=schema.Connection) as c:
+            assert schema.set_journal_mode(c, "wal") == "memory"
+
+    def test_reader_not_blocked_by_writer_in_wal_mode(self):
+        schema.set_journal_mode(self.connection, "wal")
+        schema.insert_track(self.connection, Track(uri="local:track:0", name="0"))
+        self.connection.commit()
+        self.connection.execute("BEGIN IMMEDIATE")
+        schema.insert_track(self.connection, Track(uri="local:track:1", name="1"))
+
+        reader = self.connect()
+        try:
+            assert schema.set_journal_mode(reader, "wal") == "wal"
+            assert schema.count_tracks(reader) == 1
+        finally:
+            reader.close()
+
+    def test_checkpoint_truncates_wal(self):
+        schema.set_journal_mode(self.connection, "wal")
+        schema.insert_track(self.connection, Track(uri="local:track:0", name="0"))
+        self.connection.commit()
+        wal_path = self.dbpath.with_name(self.dbpath.name + "-wal")
+        assert wal_path.stat().st_size > 0
+
+        schema.checkpoint(self.connection, "TRUNCATE")
+
+        assert wal_path.stat().st_size == 0
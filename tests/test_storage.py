@@ -1,6 +1,9 @@
+import sqlite3
+
 import pytest
+from mopidy.models import Track
 
-from mopidy_local import storage
+from mopidy_local import schema, storage
 
 
 def test_get_image_type_from_header_png():
@@ -43,3 +46,56 @@ def test_get_image_type_from_header_too_short_header():
     data_bytes = b"\xff"
     with pytest.raises(ValueError):
         storage.get_image_type_from_header(data_bytes)
+
+
+@pytest.fixture
+def config(tmp_path):
+    return {
+        "core": {"data_dir": str(tmp_path)},
+        "local": {
+            "media_dir": str(tmp_path / "media"),
+            "album_art_files": [],
+            "scan_flush_threshold": 100,
+            "sort_ignore_articles": [],
+            "timeout": 10,
+            "journal_mode": "wal",
+        },
+    }
+
+
+def test_bulk_load_commits_flushed_tracks(config):
+    provider = storage.LocalStorageProvider(config)
+    provider.load()
+    provider.begin_bulk_load()
+    provider.add(Track(uri="local:track:a.mp3", name="a"))
+
+    assert provider.flush()
+
+    with sqlite3.connect(provider._dbpath) as c:
+        assert schema.count_tracks(c) == 1
+        assert schema.fulltext_rebuild_pending(c)
+        rows = c.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+        assert set(schema._SEARCH_TRIGGERS) <= {name for (name,) in rows}
+    provider.close()
+
+    with sqlite3.connect(provider._dbpath, factory=schema.Connection) as c:
+        assert not schema.fulltext_rebuild_pending(c)
+        assert schema.search_tracks(c, [("any", "a")], 10, 0, False)
+
+
+def test_interrupted_bulk_load_is_completed_by_load(config):
+    provider = storage.LocalStorageProvider(config)
+    provider.load()
+    provider.begin_bulk_load()
+    provider.add(Track(uri="local:track:a.mp3", name="a"))
+    provider.flush()
+    # As if killed while scanning, leaving the full-text index out of date
+    provider._bulk_load.close()
+    provider._connection.close()
+
+    provider = storage.LocalStorageProvider(config)
+
+    assert provider.load() == 1
+    with sqlite3.connect(provider._dbpath, factory=schema.Connection) as c:
+        assert not schema.fulltext_rebuild_pending(c)
+        assert schema.search_tracks(c, [("any", "a")], 10, 0, False)
@@ -26,6 +26,9 @@ class LocalTracklistProviderTest(unittest.TestCase):
             "media_dir": path_to_data_dir(""),
             "directories": [],
             "timeout": 10,
+            "journal_mode": "wal",
+            "sort_ignore_articles": [],
+            "cache_size": 10000,
             "use_artist_sortname": False,
             "album_art_files": [],
         },
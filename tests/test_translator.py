@@ -105,3 +105,20 @@ def test_path_to_local_track_uri(path, uri):
 
     assert isinstance(result, str)
     assert result == uri
+
+
+@pytest.mark.parametrize(
+    ("path", "uri"),
+    [
+        (pathlib.Path("foo/bar"), "local:directory:foo/bar"),
+        (pathlib.Path("/home/alice/Music/foo"), "local:directory:foo"),
+        (pathlib.Path("æøå"), "local:directory:%C3%A6%C3%B8%C3%A5"),
+    ],
+)
+def test_path_to_local_directory_uri(path, uri):
+    media_dir = pathlib.Path("/home/alice/Music")
+
+    result = translator.path_to_local_directory_uri(path, media_dir)
+
+    assert isinstance(result, str)
+    assert result == uri
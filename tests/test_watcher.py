@@ -0,0 +1,124 @@
+import os
+import sys
+
+import pytest
+from mopidy import exceptions
+
+from mopidy_local import watcher
+
+pytestmark = pytest.mark.skipif(
+    not sys.platform.startswith("linux"),
+    reason="inotify is only available on Linux",
+)
+
+
+@pytest.fixture
+def media_watcher(tmp_path):
+    with watcher.Watcher(tmp_path) as media_watcher:
+        yield media_watcher
+
+
+def test_watch_error_is_a_mopidy_exception():
+    assert issubclass(watcher.WatchError, exceptions.MopidyException)
+
+
+def test_new_file(tmp_path, media_watcher):
+    file_path = tmp_path / "file"
+    file_path.write_bytes(b"data")
+
+    changes = media_watcher.changes(0.1)
+
+    assert changes.modified == {file_path}
+    assert changes.removed == set()
+
+
+def test_modified_file_in_subdirectory(tmp_path):
+    file_path = tmp_path / "dir" / "file"
+    file_path.parent.mkdir()
+    file_path.touch()
+
+    with watcher.Watcher(tmp_path) as media_watcher:
+        file_path.write_bytes(b"data")
+        changes = media_watcher.changes(0.1)
+
+    assert changes.modified == {file_path}
+
+
+def test_new_directory_is_reported_and_watched(tmp_path, media_watcher):
+    dir_path = tmp_path / "dir"
+    dir_path.mkdir()
+
+    changes = media_watcher.changes(0.1)
+
+    assert changes.modified == {dir_path}
+
+    file_path = dir_path / "file"
+    file_path.touch()
+
+    changes = media_watcher.changes(0.1)
+
+    assert changes.modified == {file_path}
+
+
+def test_deleted_file(tmp_path):
+    file_path = tmp_path / "file"
+    file_path.touch()
+
+    with watcher.Watcher(tmp_path) as media_watcher:
+        file_path.unlink()
+        changes = media_watcher.changes(0.1)
+
+    assert changes.modified == set()
+    assert changes.removed == {file_path}
+
+
+def test_created_and_deleted_file_is_only_removed(tmp_path, media_watcher):
+    file_path = tmp_path / "file"
+    file_path.write_bytes(b"data")
+    file_path.unlink()
+
+    changes = media_watcher.changes(0.1)
+
+    assert changes.modified == set()
+    assert changes.removed == {file_path}
+
+
+def test_moved_directory(tmp_path):
+    old_path = tmp_path / "old"
+    old_path.mkdir()
+    new_path = tmp_path / "new"
+
+    with watcher.Watcher(tmp_path) as media_watcher:
+        old_path.rename(new_path)
+        changes = media_watcher.changes(0.1)
+        assert changes.modified == {new_path}
+        assert changes.removed == {old_path}
+
+        (new_path / "file").touch()
+        changes = media_watcher.changes(0.1)
+        assert changes.modified == {new_path / "file"}
+
+
+def test_hidden_files_are_ignored(tmp_path, media_watcher):
+    (tmp_path / ".hidden").touch()
+    file_path = tmp_path / "file"
+    file_path.touch()
+
+    changes = media_watcher.changes(0.1)
+
+    assert changes.modified == {file_path}
+
+
+def test_overflow_watches_directories_created_meanwhile(tmp_path, media_watcher):
+    dir_path = tmp_path / "dir"
+    dir_path.mkdir()
+    os.read(media_watcher._fd, 64 * 1024)  # the event is lost
+    changes = watcher.Changes()
+
+    media_watcher._handle(changes, -1, watcher.IN_Q_OVERFLOW, "")
+
+    assert changes.overflowed
+    assert dir_path in media_watcher._paths.values()
+    file_path = dir_path / "file"
+    file_path.touch()
+    assert media_watcher.changes(0.1).modified == {file_path}